@@ -4,6 +4,9 @@ Blender script to generate slides
 """
 
 from util import *
+from gputil import *
+import bisect
+import os
 
 ORIGIN_X = 0
 ORIGIN_Y = 0
@@ -14,19 +17,22 @@ BOXES_X = WIDTH / 2
 PADDING = 50
 
 BELOW_BASELINE = 20 # pixels below baseline to draw
+LINE_SPACING = 10
+
+# Windowed mode: with WINDOW set, only that many lines are on screen, drawn
+# by a fixed pool of text objects that scrolls with the highlighted line
+WINDOW = None
 
 pencil = get_pencil("Stroke")
 layer = pencil.layers.get("Lines")
-layer.clear()
+clear_layer(layer)
 
 font = get_font("/Users/brian/Library/Fonts/Consolas.ttf")
 
-highlight_mat = create_or_get_material("Highlight",
-    pencil=pencil,
+highlight_mat_index = get_material_index("Highlight", pencil,
     fill=(224, 235, 157),
     stroke=False
 )
-highlight_mat_index = pencil.materials.find(highlight_mat.name)
 
 class Action():
 
@@ -44,6 +50,23 @@ class Var():
         self.location = location
         self.show_always = show_always
 
+def code_size(lines):
+    """Font size at which the longest of lines fits the code box."""
+    length = max(len(max(lines, key=len).replace("\t", "....")), 22)
+    _, char_width = font_metrics(font, METRICS_SIZE)
+    return METRICS_SIZE * (ORIGIN_X + BOXES_X - PADDING * 2) / (char_width * length)
+
+def line_metrics(line, size):
+    text_height, char_width = font_metrics(font, size)
+    metrics = {
+        "indentation": char_width * (len(line) - len(line.strip())),
+        "width": char_width * len(line.lstrip()),
+        "height": text_height
+    }
+    if metrics["indentation"] > 0:
+        metrics["indentation"] += 7
+    return metrics
+
 def draw_code(lines, size=None):
     texts = []
 
@@ -51,21 +74,11 @@ def draw_code(lines, size=None):
     if not lines:
         return
 
-    # Determine scale by using longest line
+    # Determine scale by fitting longest line
     if size is None:
-        length = len(max(lines, key=len).replace("\t", "...."))
-        longest = "|" * max(length, 22)
-        tmp_size = 60
-        tmp_longest = add_text("tmp_longest", longest, font=font, size=tmp_size)
-        bpy.context.view_layer.update()
-        goal_size = to_units(ORIGIN_X + BOXES_X - PADDING * 2)
-        scale = tmp_longest.scale[0] * goal_size / (tmp_longest.dimensions[0])
-        size = tmp_size * scale / tmp_longest.scale[0] # font size
-        set_text_size(tmp_longest, size)
-        bpy.context.view_layer.update()
-        line_height = from_units(tmp_longest.dimensions[1]) + 10
-        char_width = from_units(tmp_longest.dimensions[0]) / len(longest)
-        bpy.data.objects.remove(tmp_longest)
+        size = code_size(lines)
+    text_height, char_width = font_metrics(font, size)
+    line_height = text_height + LINE_SPACING
 
     print(line_height)
     total_height = len(lines) * line_height
@@ -73,43 +86,128 @@ def draw_code(lines, size=None):
     start_height = HEIGHT - ((HEIGHT - total_height) / 2)
 
     for i, line in enumerate(lines):
-        text = add_text(f"Line{i + 1}", line, font=font, size=size)
+        text = add_text(f"Line{i + 1}", line, font=font, size=size, shared=True)
         text.location = pt(PADDING, start_height - line_height * (i + 1))
-        text["codevisualizer"] = {
-            "indentation": char_width * (len(line) - len(line.strip())),
-            "width": char_width * len(line.lstrip())
-        }
-        if text["codevisualizer"]["indentation"] > 0:
-            text["codevisualizer"]["indentation"] += 7
+        text["codevisualizer"] = line_metrics(line, size)
         texts.append(text)
 
-    bpy.context.view_layer.update()
     return texts
 
+class CodeView():
+    """
+    Window of rows lines onto the code, drawn by a fixed pool of text
+    objects. Scrolling is recorded per frame and saved on the scene, and a
+    frame change handler applies it, since text bodies can't be keyframed.
+    """
+    def __init__(self, lines, rows):
+        self.lines = lines
+        self.rows = min(rows, len(lines))
+        text_height, _ = font_metrics(font, METRICS_SIZE)
+        fit_height = (HEIGHT - PADDING * 2) / self.rows - LINE_SPACING
+        self.size = min(code_size(lines), METRICS_SIZE * fit_height / text_height)
+        self.texts = draw_code(lines[:self.rows], size=self.size)
+        # (frame, index of first line shown), in frame order
+        self.scrolls = [(1, 0)]
+
+    @property
+    def top(self):
+        return self.scrolls[-1][1]
+
+    def scroll_to(self, line_no, frame):
+        """Scrolls from frame so that line_no is visible. Returns its text object."""
+        i = line_no - 1
+        top = self.top
+        if not top <= i < top + self.rows:
+            top = min(max(i - self.rows // 2, 0), len(self.lines) - self.rows)
+            if self.scrolls[-1][0] == frame:
+                self.scrolls[-1] = (frame, top)
+            else:
+                self.scrolls.append((frame, top))
+        return self.texts[i - top]
+
+    def save(self, scene):
+        """Stores the view on scene, where the frame change handler reads it."""
+        scene[VIEW_PROP] = {
+            "texts": [text.name for text in self.texts],
+            "lines": list(self.lines),
+            "scrolls": [n for scroll in self.scrolls for n in scroll],
+        }
+
+VIEW_PROP = "codevisualizer_view"
+
+def show_code_view(scene, frame):
+    """Sets the bodies of the pool of text objects saved on scene for frame."""
+    if VIEW_PROP not in scene:
+        return
+    view = scene[VIEW_PROP]
+    lines = view["lines"]
+    scrolls = list(view["scrolls"])
+    i = max(bisect.bisect_right(scrolls[0::2], frame) - 1, 0)
+    top = scrolls[2 * i + 1]
+    for k, name in enumerate(view["texts"]):
+        text = bpy.data.objects.get(name)
+        if text is not None and text.data.body != lines[top + k]:
+            text.data.body = lines[top + k]
+
+@bpy.app.handlers.persistent
+def update_code_view(scene, *args):
+    show_code_view(scene, scene.frame_current)
+
+def install_view(code_view):
+    """
+    Saves code_view on the scene and registers the frame change handler,
+    replacing earlier runs' handler. The handler survives loading other
+    files, but a new Blender process (e.g. blender -b to render) must run
+    this script again, as render.py workers do, or the view stays on its
+    first lines.
+    """
+    scene = bpy.context.scene
+    code_view.save(scene)
+    handlers = bpy.app.handlers.frame_change_pre
+    for handler in list(handlers):
+        if getattr(handler, "__name__", "") == "update_code_view":
+            handlers.remove(handler)
+    handlers.append(update_code_view)
+    update_code_view(scene)
+
 def draw_frame(frame, code, variables, line=None):
     pass
 
 def draw(config, code, actions):
     frame_no = 1
-    texts = draw_code(code)
-    for i, (text, line) in enumerate(zip(texts, code)):
+    if WINDOW is None:
+        texts = draw_code(code)
+        code_view = None
+    else:
+        code_view = CodeView(code, WINDOW)
+    for i, line in enumerate(code):
         line_no = i + 1
 
         # Skip empty slides
         if not len(line.strip()) and not actions.get(line_no):
             continue
 
+        if code_view is None:
+            text = texts[i]
+            metrics = text["codevisualizer"]
+        else:
+            text = code_view.scroll_to(line_no, frame_no)
+            metrics = line_metrics(line, code_view.size)
+
         # Generate slide
         frame = get_frame(layer, frame_no)
         origin = from_pt(text.location)
         rect = draw_rect(frame,
-            origin=(origin[0] + text["codevisualizer"]["indentation"], origin[1] - BELOW_BASELINE),
-            width=(text["codevisualizer"]["width"]),
-            height=from_units(text.dimensions[1]) + BELOW_BASELINE
+            origin=(origin[0] + metrics["indentation"], origin[1] - BELOW_BASELINE),
+            width=(metrics["width"]),
+            height=metrics["height"] + BELOW_BASELINE
         )
         rect.material_index = highlight_mat_index
         frame_no += 1
 
+    if code_view is not None:
+        install_view(code_view)
+
 def read_file(filename):
     return open(filename).read().strip().splitlines()
 
@@ -124,7 +222,10 @@ def sample():
         5: [Action(Action.ASSIGN, x, 2)],
     }
 
-    lines = read_file("/Users/brian/Development/blender/animations/codevisualizer/test2.c")
+    path = "/Users/brian/Development/blender/animations/codevisualizer/test2.c"
+    if not os.path.exists(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test2.c")
+    lines = read_file(path)
     draw(config, lines, actions)
 
 
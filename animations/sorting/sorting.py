@@ -3,6 +3,13 @@ Sorting animations.
 """
 
 from util import *
+from gputil import *
+from sorttrace import *
+import sorttrace
+import itertools
+import math
+import numpy as np
+import os
 import random
 
 X = 0
@@ -12,158 +19,266 @@ HEIGHT = 1080
 BAR_SPACING = 10
 PADDING = 20
 FRAMES_PER_IMAGE = 1
+SEED = None # set to make runs repeatable and cache their geometry
+
+# render.py gives all of its workers one seed, so every chunk renders the
+# same animation
+if "RENDER_SEED" in os.environ:
+    SEED = int(os.environ["RENDER_SEED"])
+COUNT = 40 # number of values to sort
+
+# Large-N mode: past LARGE_N values, the sort is sampled down to DURATION
+# seconds at FPS and neighbouring bars are merged into at most MAX_COLUMNS
+LARGE_N = 1000
+DURATION = 60
+FPS = 30
+MAX_COLUMNS = 480
 
 pencil = get_pencil("Stroke")
 layer = pencil.layers.get("Lines")
-bar_mat = create_material(
-    "Bar",
-    pencil=pencil,
+bar_mat_index = get_material_index("Bar", pencil,
     fill=(177, 186, 177),
     stroke=False
 )
-bar_mat_index = pencil.materials.find(bar_mat.name)
-bar_highlight_mat = create_material(
-    "BarHighlight",
-    pencil=pencil,
+bar_highlight_mat_index = get_material_index("BarHighlight", pencil,
     fill=(75, 104, 189),
     stroke=False
 )
-bar_highlight_mat_index = pencil.materials.find(bar_highlight_mat.name)
-bar_sorted_mat = create_material(
-    "BarSorted",
-    pencil=pencil,
+bar_sorted_mat_index = get_material_index("BarSorted", pencil,
     fill=(26, 173, 28),
     stroke=False
 )
-bar_sorted_mat_index = pencil.materials.find(bar_sorted_mat.name)
+
+# Delta mode: bars that don't change are drawn on a static layer whose
+# keyframes hold across frames, and only the bars around the ones that
+# change are redrawn on a dynamic layer every frame.
+DELTA = False
+DYNAMIC_LAYER = "LinesDynamic"
+dynamic_layer = None # created by start_delta
+
+# Frames identical to the one before are not drawn; the previous
+# grease pencil keyframe holds instead
+DEDUPLICATE = True
 
 current_frame = 1
+delta_base = None # bar states on the current static keyframe
+delta_excluded = set() # bars left out of the static keyframe
+last_frame_key = None # content of the last drawn frame
+stroke_counts = {"full": 0, "drawn": 0, "held_frames": 0, "held_strokes": 0}
+
+def bar_geometry(bars, max_value):
+    spacing = min(BAR_SPACING, (WIDTH - (PADDING * 2)) / len(bars) / 4)
+    bar_width = (WIDTH - (PADDING * 2) - ((len(bars) - 1) * spacing)) / len(bars)
+    height_unit = (HEIGHT - (PADDING * 2)) / (max_value * 1.3)
+    return bar_width, spacing, height_unit
+
+def bar_states(bars, highlight, done):
+    states = []
+    for i, bar in enumerate(bars):
+        if i in done:
+            states.append((bar, bar_sorted_mat_index))
+        elif i in highlight:
+            states.append((bar, bar_highlight_mat_index))
+        else:
+            states.append((bar, bar_mat_index))
+    return states
+
+def draw_bar(frame, i, state, bar_width, spacing, height_unit):
+    bar, mat_index = state
+    x = PADDING + i * (bar_width + spacing)
+    y = PADDING
+    stroke = draw_rect(frame, (X + x, Y + y), bar_width, bar * height_unit)
+    stroke.material_index = mat_index
+    stroke_counts["drawn"] += 1
+    return stroke
+
+def draw_pointer(frame, pointer, bar_width, spacing):
+    x = PADDING + pointer * (bar_width + spacing)
+    y = PADDING
+    stroke = draw_stroke(frame, pts((
+        (X + x, Y + y - 10),
+        (X + x + bar_width, Y + y - 10),
+        (X + x + (bar_width / 2), Y + y + 10),
+        (X + x, Y + y - 10)
+    )))
+    stroke.material_index = bar_highlight_mat_index
+    stroke_counts["drawn"] += 1
+    return stroke
+
+def get_dynamic_layer():
+    global dynamic_layer
+    if dynamic_layer is None:
+        dynamic_layer = pencil.layers.get(DYNAMIC_LAYER) or pencil.layers.new(DYNAMIC_LAYER)
+    return dynamic_layer
+
+def clear_dynamic_layer():
+    """Clears the dynamic layer of an earlier delta run, which would draw over full redraws."""
+    stale = pencil.layers.get(DYNAMIC_LAYER)
+    if stale is not None:
+        clear_layer(stale)
+
+def start_delta():
+    """Resets delta state and clears both layers, since stale keyframes would break holds."""
+    global delta_base, delta_excluded
+    delta_base = None
+    delta_excluded = set()
+    clear_layer(layer)
+    clear_layer(get_dynamic_layer())
+
 def draw_bars(bars, highlight=None, done=None, pointer=None, max_value=None):
-    global current_frame
+    global current_frame, last_frame_key
     if max_value is None:
         max_value = max(bars)
-    frame = get_frame(layer, current_frame)
-    bar_width = (WIDTH - (PADDING * 2) - ((len(bars) - 1) * BAR_SPACING)) / len(bars)
-    height_unit = (HEIGHT - (PADDING * 2)) / (max_value * 1.3)
-
     if highlight is None:
         highlight = set()
     if done is None:
         done = set()
+    geometry = bar_geometry(bars, max_value)
+    states = bar_states(bars, highlight, done)
+    stroke_counts["full"] += len(bars) + (pointer is not None)
 
-    for i, bar in enumerate(bars):
-        x = PADDING + i * (bar_width + BAR_SPACING)
-        y = PADDING
-        stroke = draw_rect(frame, (X + x, Y + y), bar_width, bar * height_unit)
-        if i in done:
-            stroke.material_index = bar_sorted_mat_index
-        elif i in highlight:
-            stroke.material_index = bar_highlight_mat_index
-        else:
-            stroke.material_index = bar_mat_index
+    key = (tuple(states), pointer, geometry)
+    if DEDUPLICATE and key == last_frame_key:
+        stroke_counts["held_frames"] += 1
+        stroke_counts["held_strokes"] += (
+            (len(delta_excluded) if DELTA else len(states)) + (pointer is not None)
+        )
+        current_frame += FRAMES_PER_IMAGE
+        return
+    last_frame_key = key
 
-    if pointer is not None:
-        x = PADDING + pointer * (bar_width + BAR_SPACING)
-        y = PADDING
-        stroke = frame.strokes.new()
-        stroke.display_mode = "3DSPACE"
-        stroke.points.add(count=4)
-        stroke.points[0].co = pt(X + x, Y + y - 10)
-        stroke.points[1].co = pt(X + x + bar_width, Y + y - 10)
-        stroke.points[2].co = pt(X + x + (bar_width / 2), Y + y + 10)
-        stroke.points[3].co = pt(X + x, Y + y - 10)
-        stroke.material_index = bar_highlight_mat_index
+    if DELTA:
+        draw_bars_delta(states, pointer, geometry)
+    else:
+        frame = get_frame(layer, current_frame)
+        for i, state in enumerate(states):
+            draw_bar(frame, i, state, *geometry)
+        if pointer is not None:
+            draw_pointer(frame, pointer, *geometry[:2])
     current_frame += FRAMES_PER_IMAGE
 
-def selection_sort(numbers):
-    draw_bars(numbers)
-    length = len(numbers)
-    done = set()
-    for i in range(length):
-        min_index = i
-        for j in range(i, length):
-            draw_bars(numbers, highlight={j}, done=done, pointer=min_index)
-            if numbers[j] < numbers[min_index]:
-                min_index = j
-        tmp = numbers[min_index]
-        numbers[min_index] = numbers[i]
-        numbers[i] = tmp
-        done.add(i)
-        draw_bars(numbers, done=done)
-
-def bubble_sort(numbers):
-    draw_bars(numbers)
-    length = len(numbers)
-    done = set()
-    for i in range(length):
-        for j in range(length - i - 1):
-            draw_bars(numbers, highlight={j, j + 1}, done=done)
-            if numbers[j] > numbers[j + 1]:
-                tmp = numbers[j]
-                numbers[j] = numbers[j + 1]
-                numbers[j + 1] = tmp
-        done.add(length - i - 1)
-    draw_bars(numbers, done=done)
-
-def insertion_sort(numbers):
-    draw_bars(numbers)
-    length = len(numbers)
-    done = set()
-    for i in range(length):
-        draw_bars(numbers, highlight={i}, done=done)
-        done.add(i)
-        for j in range(i - 1, -1, -1):
-            if numbers[j + 1] < numbers[j]:
-                tmp = numbers[j + 1]
-                numbers[j + 1] = numbers[j]
-                numbers[j] = tmp
-                draw_bars(numbers, highlight={j}, done=done - {j})
-            else:
-                draw_bars(numbers, highlight={j}, done=done - {j})
-                break
-        draw_bars(numbers, done=done)
-    draw_bars(numbers, done=done)
-    return numbers
-
-def mergesort(numbers):
-    done = set()
-    length = len(numbers)
-    max_value = max(numbers)
-    draw_bars(numbers, max_value=max_value)
-    def mergesort_aux(numbers, start, end):
-        if end - start <= 1:
+def draw_bars_delta(states, pointer, geometry):
+    global delta_base, delta_excluded
+    changed = {
+        i for i, state in enumerate(states)
+        if delta_base is None or state != delta_base[i]
+    }
+    if delta_base is None or not changed <= delta_excluded:
+        # New static keyframe with every bar at rest, leaving out a window
+        # around the highlighted bars, which is where the next changes land.
+        radius = max(1, int((len(states) / 2) ** 0.5))
+        delta_base = [
+            (bar, bar_mat_index if mat_index == bar_highlight_mat_index else mat_index)
+            for bar, mat_index in states
+        ]
+        delta_excluded = set()
+        for i, state in enumerate(states):
+            if state != delta_base[i]:
+                delta_excluded.update(range(max(0, i - radius), min(len(states), i + radius + 1)))
+        frame = get_frame(layer, current_frame)
+        for i, state in enumerate(delta_base):
+            if i not in delta_excluded:
+                draw_bar(frame, i, state, *geometry)
+
+    # Dynamic frame is created every time, even when empty, so the previous
+    # one doesn't hold
+    frame = get_frame(dynamic_layer, current_frame)
+    for i in sorted(delta_excluded):
+        draw_bar(frame, i, states[i], *geometry)
+    if pointer is not None:
+        draw_pointer(frame, pointer, *geometry[:2])
+
+def columns(bars, highlight, done, pointer):
+    """
+    Merges bars into at most MAX_COLUMNS columns: each column is as tall as
+    its tallest bar, highlighted if any of its bars is, and done once all
+    of them are.
+    """
+    per = math.ceil(len(bars) / MAX_COLUMNS)
+    starts = np.arange(0, len(bars), per)
+    heights = np.maximum.reduceat(np.asarray(bars), starts).tolist()
+    sizes = np.diff(np.append(starts, len(bars)))
+    done_counts = np.bincount(
+        np.fromiter(done, dtype=np.int64, count=len(done)) // per, minlength=len(starts)
+    )
+    return (
+        heights,
+        {i // per for i in highlight},
+        set(np.flatnonzero(done_counts == sizes).tolist()),
+        None if pointer is None else pointer // per,
+    )
+
+def render_batches(trace, batch_size=100):
+    """Draws the frames of trace, yielding the number drawn after each batch."""
+    global last_frame_key
+    max_value = max(trace.values)
+    last_frame_key = None
+    if DELTA:
+        start_delta()
+    else:
+        # A held frame would show an old keyframe at the same frame number
+        clear_layer(layer)
+        clear_dynamic_layer()
+    frames = trace.replay()
+    drawn = 0
+    while True:
+        # Each chunk is its own batch, written before yielding, so no batch
+        # stays open while the caller (e.g. a timer job) is between chunks
+        count = 0
+        with batch():
+            for bars, highlight, done, pointer in itertools.islice(frames, batch_size):
+                if len(bars) > MAX_COLUMNS:
+                    bars, highlight, done, pointer = columns(bars, highlight, done, pointer)
+                draw_bars(bars, highlight=highlight, done=done, pointer=pointer, max_value=max_value)
+                count += 1
+        if not count:
             return
-        midpoint = int(start + ((end - start) / 2))
-        mergesort_aux(numbers, start, midpoint)
-        mergesort_aux(numbers, midpoint, end)
-        left = numbers[start:midpoint]
-        right = numbers[midpoint:end]
-        i = start
-        while left or right:
-            if not right:
-                numbers[i] = left[0]
-                left = left[1:]
-            elif not left:
-                numbers[i] = right[0]
-                right = right[1:]
-            elif left[0] <= right[0]:
-                numbers[i] = left[0]
-                left = left[1:]
-            else:
-                numbers[i] = right[0]
-                right = right[1:]
-            if start == 0 and end == length:
-                done.add(i)
-            draw_bars(numbers, highlight={i}, max_value=max_value, done=done - {i})
-            i += 1
-    mergesort_aux(numbers, 0, len(numbers))
-    draw_bars(numbers, done=done, max_value=max_value)
-    return numbers
+        drawn += count
+        yield drawn
+
+def render_trace(trace, batch_size=100):
+    for _ in render_batches(trace, batch_size):
+        pass
 
 def main():
-    values = [random.randint(10, 500) for _ in range(40)]
-    mergesort(values)
-    print(f"Animation Generated. Final Frames: {current_frame}")
+    if SEED is not None:
+        random.seed(SEED)
+    values = [random.randint(10, 500) for _ in range(COUNT)]
+    if COUNT > LARGE_N:
+        trace = sample_trace(mergesort, values, DURATION * FPS // FRAMES_PER_IMAGE)
+    else:
+        trace = trace_sort(mergesort, values)
+    def generate():
+        return render_batches(trace, batch_size=10)
+    if not DELTA:
+        # render_batches does this too, but a cache hit skips it
+        clear_dynamic_layer()
+    if SEED is None:
+        steps = generate()
+    else:
+        steps = cached_steps("sorting", {
+            "values": values,
+            "algorithm": "mergesort",
+            "sampling": (LARGE_N, DURATION, FPS, MAX_COLUMNS),
+            "frames_per_image": FRAMES_PER_IMAGE,
+            "delta": DELTA,
+            "layout": (X, Y, WIDTH, HEIGHT, BAR_SPACING, PADDING),
+            "materials": (bar_mat_index, bar_highlight_mat_index, bar_sorted_mat_index),
+            "source": source_hash(__file__, sorttrace.__file__),
+        }, [layer, get_dynamic_layer()] if DELTA else [layer], generate)
+    def finished(job):
+        global current_frame
+        if job.state != "finished":
+            print(f"Animation {job.state} after {job.done} of {job.total} frames")
+            return
+        if job.result:
+            current_frame += trace.frame_count() * FRAMES_PER_IMAGE
+        print(f"Animation Generated. Final Frames: {current_frame}")
+        print(f"Strokes: {stroke_counts['drawn']} drawn, {stroke_counts['full']} with full redraws")
+        print(f"Held: {stroke_counts['held_frames']} frames, {stroke_counts['held_strokes']} strokes saved")
+    # From Blender's UI, frames are generated in the background a few at a
+    # time; util.jobs()[0].cancel() stops the run
+    return run_steps(steps, total=trace.frame_count(), on_done=finished)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,296 @@
+"""
+Sort traces.
+
+Sorting algorithms record what they do as a compact event trace instead of
+drawing while they run. Traces don't depend on Blender, so they can be
+generated, cached and checked outside of it and replayed by a renderer.
+"""
+
+import math
+from array import array
+
+# Event codes. Each event is four ints: (code, a, b, c), -1 when unused.
+SHOW = 0     # draw a frame with no highlight
+COMPARE = 1  # draw a frame highlighting a (and b), with pointer at c
+SWAP = 2     # swap values at a and b
+WRITE = 3    # values[a] = b
+DONE = 4     # mark a as sorted
+MARK = 5     # highlight a in the next frame too
+
+EVENT_SIZE = 4
+
+class Trace():
+    """Initial values plus a flat array of events."""
+
+    def __init__(self, values, events=None):
+        self.values = list(values)
+        self.events = events if events is not None else array("i")
+
+    def __len__(self):
+        return len(self.events) // EVENT_SIZE
+
+    def __iter__(self):
+        events = self.events
+        for i in range(0, len(events), EVENT_SIZE):
+            yield tuple(events[i:i + EVENT_SIZE])
+
+    def record(self, code, a=-1, b=-1, c=-1):
+        self.events.extend((code, a, b, c))
+
+    def show(self):
+        self.record(SHOW)
+
+    def compare(self, a, b=-1, pointer=-1):
+        self.record(COMPARE, a, b, pointer)
+
+    def swap(self, a, b):
+        self.record(SWAP, a, b)
+
+    def write(self, i, value):
+        self.record(WRITE, i, value)
+
+    def done(self, i):
+        self.record(DONE, i)
+
+    def frame_count(self):
+        events = self.events
+        return sum(
+            1 for i in range(0, len(events), EVENT_SIZE)
+            if events[i] in (SHOW, COMPARE)
+        )
+
+    def replay(self):
+        """
+        Yields (bars, highlight, done, pointer) for every frame in the trace.
+        bars is updated in place between frames, so copy it to keep it.
+        Highlighted bars are never reported as done.
+        """
+        bars = list(self.values)
+        done = set()
+        marked = set()
+        for code, a, b, c in self:
+            if code == SHOW:
+                yield bars, marked, done - marked, None
+                marked = set()
+            elif code == COMPARE:
+                highlight = marked | ({a} if b < 0 else {a, b})
+                yield bars, highlight, done - highlight, c if c >= 0 else None
+                marked = set()
+            elif code == MARK:
+                marked.add(a)
+            elif code == SWAP:
+                bars[a], bars[b] = bars[b], bars[a]
+            elif code == WRITE:
+                bars[a] = b
+            elif code == DONE:
+                done.add(a)
+
+    def result(self):
+        """Values after every event has been applied."""
+        bars = list(self.values)
+        for code, a, b, c in self:
+            if code == SWAP:
+                bars[a], bars[b] = bars[b], bars[a]
+            elif code == WRITE:
+                bars[a] = b
+        return bars
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            array("q", (len(self.values), len(self.events))).tofile(f)
+            array("q", self.values).tofile(f)
+            self.events.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = array("q")
+            header.fromfile(f, 2)
+            values = array("q")
+            values.fromfile(f, header[0])
+            events = array("i")
+            events.fromfile(f, header[1])
+        return cls(values, events)
+
+class FrameCounter(Trace):
+    """Counts the frames an algorithm would record, without storing events."""
+
+    def __init__(self, values):
+        super().__init__(values)
+        self.frames = 0
+
+    def record(self, code, a=-1, b=-1, c=-1):
+        if code == SHOW or code == COMPARE:
+            self.frames += 1
+
+class SampledTrace(Trace):
+    """
+    Trace that keeps one frame in every stride, plus the last. Swaps and
+    writes between kept frames are folded into one WRITE per changed
+    index. With aggregate, a kept COMPARE frame highlights every bar
+    compared since the last kept frame.
+    """
+
+    def __init__(self, values, stride, total, aggregate=True):
+        super().__init__(values)
+        self.stride = stride
+        self.total = total
+        self.aggregate = aggregate
+        self.frame = 0
+        self.current = list(values)
+        self.changed = {}
+        self.finished = []
+        self.compared = set()
+
+    def record(self, code, a=-1, b=-1, c=-1):
+        current = self.current
+        if code == SWAP:
+            current[a], current[b] = current[b], current[a]
+            self.changed[a] = current[a]
+            self.changed[b] = current[b]
+            return
+        if code == WRITE:
+            current[a] = b
+            self.changed[a] = b
+            return
+        if code == DONE:
+            self.finished.append(a)
+            return
+        if self.aggregate and code == COMPARE:
+            self.compared.add(a)
+            if b >= 0:
+                self.compared.add(b)
+        frame = self.frame
+        self.frame += 1
+        if frame % self.stride and frame != self.total - 1:
+            return
+        emit = super().record
+        for i, value in self.changed.items():
+            emit(WRITE, i, value)
+        for i in self.finished:
+            emit(DONE, i)
+        if code == COMPARE:
+            for i in self.compared:
+                emit(MARK, i)
+        self.changed = {}
+        self.finished = []
+        self.compared = set()
+        emit(code, a, b, c)
+
+"""
+Algorithms
+"""
+
+def selection_sort(numbers, trace=None):
+    if trace is None:
+        trace = Trace(numbers)
+    trace.show()
+    length = len(numbers)
+    for i in range(length):
+        min_index = i
+        for j in range(i, length):
+            trace.compare(j, pointer=min_index)
+            if numbers[j] < numbers[min_index]:
+                min_index = j
+        numbers[min_index], numbers[i] = numbers[i], numbers[min_index]
+        trace.swap(i, min_index)
+        trace.done(i)
+        trace.show()
+    return trace
+
+def bubble_sort(numbers, trace=None):
+    if trace is None:
+        trace = Trace(numbers)
+    trace.show()
+    length = len(numbers)
+    for i in range(length):
+        for j in range(length - i - 1):
+            trace.compare(j, j + 1)
+            if numbers[j] > numbers[j + 1]:
+                numbers[j], numbers[j + 1] = numbers[j + 1], numbers[j]
+                trace.swap(j, j + 1)
+        trace.done(length - i - 1)
+    trace.show()
+    return trace
+
+def insertion_sort(numbers, trace=None):
+    if trace is None:
+        trace = Trace(numbers)
+    trace.show()
+    length = len(numbers)
+    for i in range(length):
+        trace.compare(i)
+        trace.done(i)
+        for j in range(i - 1, -1, -1):
+            if numbers[j + 1] < numbers[j]:
+                numbers[j], numbers[j + 1] = numbers[j + 1], numbers[j]
+                trace.swap(j, j + 1)
+                trace.compare(j)
+            else:
+                trace.compare(j)
+                break
+        trace.show()
+    trace.show()
+    return trace
+
+def mergesort(numbers, trace=None):
+    if trace is None:
+        trace = Trace(numbers)
+    trace.show()
+    length = len(numbers)
+    def mergesort_aux(numbers, start, end):
+        if end - start <= 1:
+            return
+        midpoint = int(start + ((end - start) / 2))
+        mergesort_aux(numbers, start, midpoint)
+        mergesort_aux(numbers, midpoint, end)
+        left = numbers[start:midpoint]
+        right = numbers[midpoint:end]
+        l = r = 0
+        for i in range(start, end):
+            if r == len(right) or (l < len(left) and left[l] <= right[r]):
+                numbers[i] = left[l]
+                l += 1
+            else:
+                numbers[i] = right[r]
+                r += 1
+            trace.write(i, numbers[i])
+            if start == 0 and end == length:
+                trace.done(i)
+            trace.compare(i)
+    mergesort_aux(numbers, 0, length)
+    trace.show()
+    return trace
+
+ALGORITHMS = {
+    "selection": selection_sort,
+    "bubble": bubble_sort,
+    "insertion": insertion_sort,
+    "merge": mergesort,
+}
+
+# (algorithm name, values) -> Trace
+_traces = {}
+
+def trace_sort(algorithm, values):
+    """Returns the trace of sorting values with algorithm, cached by input."""
+    if isinstance(algorithm, str):
+        algorithm = ALGORITHMS[algorithm]
+    key = (algorithm.__name__, tuple(values))
+    trace = _traces.get(key)
+    if trace is None:
+        trace = _traces[key] = algorithm(list(values))
+    return trace
+
+def sample_trace(algorithm, values, frames, aggregate=True):
+    """
+    Trace of sorting values with algorithm, sampled down to at most about
+    frames frames. The algorithm runs twice: once to count its frames, and
+    once recording only the sampled ones, so memory stays bounded by the
+    output rather than by the number of operations.
+    """
+    if isinstance(algorithm, str):
+        algorithm = ALGORITHMS[algorithm]
+    counter = algorithm(list(values), FrameCounter(values))
+    stride = max(1, math.ceil(counter.frames / frames))
+    return algorithm(list(values), SampledTrace(values, stride, counter.frames, aggregate))
@@ -1,5 +1,15 @@
 import bpy
+import hashlib
+import json
 import math
+import os
+import re
+import tempfile
+import zipfile
+import numpy as np
+import instrument
+import util
+from functools import lru_cache
 
 UNIT_SCALE = 0.0045 # number of Blender units in a pixel
 
@@ -13,6 +23,8 @@ def rgb(r, g, b, alpha=1):
 
 def create_material(name, pencil=None, color=None, fill=None, stroke=True):
     material = bpy.data.materials.new(name)
+    if instrument.ENABLED:
+        instrument.count("materials")
     bpy.data.materials.create_gpencil_data(material)
     if pencil is not None:
         pencil.materials.append(material)
@@ -34,6 +46,8 @@ def create_or_get_material(name, **kwargs):
 
 def create_material_3d(name, color=(0, 0, 0)):
     mat = bpy.data.materials.new(name)
+    if instrument.ENABLED:
+        instrument.count("materials")
     mat.diffuse_color = rgb(*color)
     return mat
 
@@ -43,6 +57,114 @@ def create_or_get_material_3d(name, **kwargs):
         mat = create_material_3d(name, **kwargs)
     return mat
 
+# (name, color, fill, stroke) -> material name
+_material_registry = {}
+# (pencil pointer, material name) -> slot index
+_material_slots = {}
+
+def base_name(name):
+    """Name without Blender's .001-style duplicate suffix."""
+    return re.sub(r"\.\d{3,}$", "", name)
+
+def same_color(a, b):
+    return all(abs(x - y) < 1e-4 for x, y in zip(a, b))
+
+def material_matches(material, color=None, fill=None, stroke=True):
+    """Whether material has the settings create_material would give it."""
+    style = material.grease_pencil
+    if style is None or style.show_stroke != stroke:
+        return False
+    if color is not None and not same_color(style.color, rgb(*color)):
+        return False
+    if fill is None:
+        return not style.show_fill
+    return style.show_fill and same_color(style.fill_color, rgb(*fill))
+
+def get_material(name, pencil=None, color=None, fill=None, stroke=True):
+    """
+    Idempotent create_material. Returns the material registered for these
+    arguments, adopting an existing material with the same base name and
+    settings (e.g. from an earlier run) before creating a new one.
+    """
+    key = (name, color and tuple(color), fill and tuple(fill), stroke)
+    material = bpy.data.materials.get(_material_registry.get(key, ""))
+    if material is None:
+        candidates = [bpy.data.materials.get(name)] + [
+            mat for mat in bpy.data.materials if base_name(mat.name) == name
+        ]
+        material = next((
+            mat for mat in candidates
+            if mat is not None and material_matches(mat, color, fill, stroke)
+        ), None)
+        if material is None:
+            material = create_material(name, color=color, fill=fill, stroke=stroke)
+        _material_registry[key] = material.name
+    if pencil is not None:
+        material_index(pencil, material)
+    return material
+
+def material_index(pencil, material):
+    """Slot index of material in pencil, appending it if missing. Cached per pencil."""
+    key = (pencil.as_pointer(), material.name)
+    index = _material_slots.get(key)
+    if index is None or index >= len(pencil.materials) or pencil.materials[index] != material:
+        index = pencil.materials.find(material.name)
+        if index == -1:
+            pencil.materials.append(material)
+            index = len(pencil.materials) - 1
+        _material_slots[key] = index
+    return index
+
+def get_material_index(name, pencil, color=None, fill=None, stroke=True):
+    """Slot index in pencil of get_material(name, ...)."""
+    return material_index(pencil, get_material(name, color=color, fill=fill, stroke=stroke))
+
+def remove_duplicate_materials():
+    """
+    Garbage-collects grease pencil materials that duplicate another one's
+    base name and settings. Slots holding a duplicate that no stroke uses
+    are removed from pencils, then duplicates left without users are
+    deleted. Returns the names of deleted materials.
+    """
+    registered = set(_material_registry.values())
+    groups = {}
+    for mat in bpy.data.materials:
+        style = mat.grease_pencil
+        if style is None:
+            continue
+        settings = (
+            base_name(mat.name),
+            tuple(round(c, 4) for c in style.color),
+            tuple(round(c, 4) for c in style.fill_color) if style.show_fill else None,
+            style.show_stroke,
+        )
+        groups.setdefault(settings, []).append(mat)
+    duplicates = set()
+    for mats in groups.values():
+        # Keep a registered material, or else the one with the plainest name
+        mats.sort(key=lambda mat: (mat.name not in registered, len(mat.name), mat.name))
+        duplicates.update(mat.name for mat in mats[1:])
+    for pencil in bpy.data.grease_pencils:
+        used = {
+            stroke.material_index
+            for layer in pencil.layers
+            for frame in layer.frames
+            for stroke in frame.strokes
+        }
+        # Highest first, so the slots still to check keep their indices
+        for i in reversed(range(len(pencil.materials))):
+            mat = pencil.materials[i]
+            if mat is not None and mat.name in duplicates and i not in used:
+                pencil.materials.pop(index=i)
+    _material_slots.clear()
+    removed = []
+    for name in sorted(duplicates):
+        mat = bpy.data.materials[name]
+        if mat.users == 0:
+            bpy.data.materials.remove(mat)
+            removed.append(name)
+    return removed
+
 """
 Drawing
 """
@@ -53,9 +175,25 @@ def pt(x, y, x_offset=4.32, y_offset=2.43, scale=UNIT_SCALE):
     """
     return (x * scale - x_offset, 0, y * scale - y_offset)
 
+def pts(points, x_offset=4.32, y_offset=2.43, scale=UNIT_SCALE):
+    """
+    Vectorized pt(): translates an (..., 2) array of points into an
+    (..., 3) float32 array of coordinates, ready for foreach_set.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    co = np.zeros(points.shape[:-1] + (3,), dtype=np.float32)
+    co[..., 0] = points[..., 0] * scale - x_offset
+    co[..., 2] = points[..., 1] * scale - y_offset
+    return co
+
 def from_pt(point, x_offset=4.32, y_offset=2.43, scale=UNIT_SCALE):
     return ((point[0] + x_offset) / scale, (point[2] + y_offset) / scale)
 
+def from_pts(co, x_offset=4.32, y_offset=2.43, scale=UNIT_SCALE):
+    """Vectorized from_pt(): (n, 3) coordinates back to an (n, 2) array of pixels."""
+    co = np.asarray(co, dtype=np.float64).reshape(-1, 3)
+    return np.stack(((co[:, 0] + x_offset) / scale, (co[:, 2] + y_offset) / scale), axis=1)
+
 def create_pencil(name="GPencil", data_name="GPencilData"):
     pencil = bpy.data.grease_pencils.new(data_name)
     pencil_obj = bpy.data.objects.new(name, object_data=pencil)
@@ -66,107 +204,514 @@ def get_pencil(name):
     pencil = bpy.data.grease_pencils.get(name)
     return pencil
 
+# layer pointer -> {frame number: frame}
+_frame_index = {}
+
+def frame_index(layer, rebuild=False):
+    """
+    Frame number -> frame mapping for layer. Kept in sync by get_frame,
+    ensure_frames, remove_frame and clear_layer; frames created or removed
+    behind gputil's back need rebuild=True or sync_frames.
+    """
+    key = layer.as_pointer()
+    index = _frame_index.get(key)
+    if index is None or rebuild:
+        index = {frame.frame_number: frame for frame in layer.frames}
+        _frame_index[key] = index
+    return index
+
+def sync_frames(layer):
+    """
+    frame_index, rebuilt if its size no longer matches the layer's, so
+    frames cleared or deleted elsewhere (or a layer reusing a freed
+    pointer) aren't handed back. len(layer.frames) walks the frames, so
+    call this once per draw pass rather than per frame.
+    """
+    index = frame_index(layer)
+    if len(index) != len(layer.frames):
+        index = frame_index(layer, rebuild=True)
+    return index
+
 def get_frame(layer, n):
-    try:
-        frame = layer.frames.new(n)
-        return frame
-    except RuntimeError:
-        for frame in layer.frames:
-            if frame.frame_number == n:
-                return frame
-    return None
+    index = frame_index(layer)
+    frame = index.get(n)
+    if frame is None:
+        try:
+            frame = layer.frames.new(n)
+            if instrument.ENABLED:
+                instrument.count("frames")
+        except RuntimeError:
+            # Frame was created outside of gputil
+            index = frame_index(layer, rebuild=True)
+            frame = index.get(n)
+            if frame is None:
+                return None
+        index[n] = frame
+    return frame
 
-def draw_line(frame, p0, p1, line_width=5):
+def ensure_frames(layer, start, end):
+    """Returns frames start..end (inclusive), creating any that are missing."""
+    index = sync_frames(layer)
+    frames_new = layer.frames.new
+    frames = []
+    for n in range(start, end + 1):
+        frame = index.get(n)
+        if frame is None:
+            frame = index[n] = frames_new(n)
+            if instrument.ENABLED:
+                instrument.count("frames")
+        frames.append(frame)
+    return frames
+
+def remove_frame(layer, n):
+    frame = frame_index(layer).pop(n, None)
+    if frame is not None:
+        layer.frames.remove(frame)
+
+def clear_layer(layer):
+    layer.clear()
+    _frame_index[layer.as_pointer()] = {}
+
+class PendingStroke():
+    """
+    Stands in for a stroke drawn inside util.batch(). Attributes set on it
+    are applied when the stroke is created; afterwards it forwards to the
+    created stroke.
+    """
+    def __init__(self, frame, co, attrs):
+        self.__dict__.update(frame=frame, co=co, attrs=attrs, stroke=None)
+
+    def __getattr__(self, name):
+        if self.stroke is not None:
+            return getattr(self.stroke, name)
+        try:
+            return self.attrs[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if self.stroke is not None:
+            setattr(self.stroke, name, value)
+        else:
+            self.attrs[name] = value
+
+    def key(self):
+        return (self.frame.as_pointer(), self.co.tobytes(), tuple(sorted(self.attrs.items())))
+
+def new_stroke(frame, co, attrs):
     stroke = frame.strokes.new()
-    stroke.display_mode = "3DSPACE"
-    stroke.points.add(count=2)
-    stroke.points[0].co = p0
-    stroke.points[1].co = p1
-    stroke.line_width = line_width
+    if instrument.ENABLED:
+        instrument.count("strokes")
+    for name, value in attrs.items():
+        setattr(stroke, name, value)
+    stroke.points.add(count=len(co))
+    stroke.points.foreach_set("co", co.ravel())
     return stroke
 
-def draw_rect(frame, origin, width, height, line_width=5):
+def create_strokes(pending):
+    """Creates pending strokes frame by frame, drawing identical strokes once."""
+    created = {}
+    pending = sorted(pending, key=lambda p: p.frame.as_pointer())
+    for p in pending:
+        key = p.key()
+        stroke = created.get(key)
+        if stroke is None:
+            stroke = created[key] = new_stroke(p.frame, p.co, p.attrs)
+        p.__dict__["stroke"] = stroke
+
+def draw_stroke(frame, co, line_width=5):
+    """Creates a stroke from an (n, 3) array of coordinates in one write."""
+    co = np.asarray(co, dtype=np.float32)
+    attrs = {"display_mode": "3DSPACE", "line_width": line_width}
+    batch = util.current_batch()
+    if batch is not None:
+        stroke = PendingStroke(frame, co, attrs)
+        batch.queue("gputil.strokes", create_strokes).append(stroke)
+        return stroke
+    return new_stroke(frame, co, attrs)
+
+def draw_line(frame, p0, p1, line_width=5):
+    return draw_stroke(frame, (p0, p1), line_width=line_width)
+
+def rect_points(origin, width, height):
     x, y = origin
-    stroke = frame.strokes.new()
-    stroke.display_mode = "3DSPACE"
-    stroke.points.add(count=5)
-    stroke.points[0].co = pt(x, y)
-    stroke.points[1].co = pt(x + width, y)
-    stroke.points[2].co = pt(x + width, y + height)
-    stroke.points[3].co = pt(x, y + height)
-    stroke.points[4].co = pt(x, y)
-    stroke.line_width = 5
-    return stroke
+    return np.array((
+        (x, y),
+        (x + width, y),
+        (x + width, y + height),
+        (x, y + height),
+        (x, y)
+    ))
+
+def draw_rect(frame, origin, width, height, line_width=5):
+    return draw_stroke(frame, pts(rect_points(origin, width, height)), line_width=line_width)
+
+@lru_cache(maxsize=None)
+def unit_circle(samples):
+    """Closed unit circle of samples points, shared between calls."""
+    theta = np.linspace(0, math.tau, samples)
+    circle = np.stack((np.cos(theta), np.sin(theta)), axis=1)
+    circle.flags.writeable = False
+    return circle
 
 def draw_circle(frame, origin, radius, samples=100, line_width=5):
-    x, y = origin
-    stroke = frame.strokes.new()
-    stroke.display_mode = "3DSPACE"
-    stroke.points.add(count=samples)
-    for i in range(samples):
-        theta = (math.tau / (samples - 1)) * i
-        stroke.points[i].co = pt(
-            radius * math.cos(theta) + x,
-            radius * math.sin(theta) + y
-        )
-    stroke.line_width = line_width
-    return stroke
+    return draw_stroke(frame, pts(unit_circle(samples) * radius + origin), line_width=line_width)
+
+def circles(centers, radius, samples=100):
+    """Points of a circle around each of (n, 2) centers, as an (n, samples, 2) array."""
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 1, 2)
+    return unit_circle(samples) * radius + centers
+
+def draw_frames(layer, start, strokes, line_width=5, material_index=0):
+    """
+    Draws pre-sampled animation on consecutive frames from start. strokes
+    is a list of (frames, points, 3) coordinate arrays, one per stroke.
+    """
+    frames = ensure_frames(layer, start, start + len(strokes[0]) - 1)
+    for f, frame in enumerate(frames):
+        for co in strokes:
+            stroke = draw_stroke(frame, co[f], line_width=line_width)
+            stroke.material_index = material_index
+    return frames
+
+"""
+Timelines
+"""
+
+def ease_linear(x):
+    return x
+
+def ease_in_out(x):
+    return x * x * (3 - 2 * x)
+
+def tween(start, end, frames, easing=ease_linear):
+    """Channel moving from start to end over frames, shaped by easing."""
+    return lambda t: start + (end - start) * easing(t / max(frames - 1, 1))
+
+def velocity(start, per_frame):
+    """Channel moving from start by per_frame every frame."""
+    return lambda t: start + per_frame * t
+
+class Timeline():
+    """
+    Motion declared as segments of frames. Each segment gives channels as
+    functions of t, the frame offset within the segment (a float array);
+    channels a segment leaves out hold their last value. sample() evaluates
+    every frame at once.
+    """
+    def __init__(self, **initial):
+        self.initial = initial
+        self.segments = []
+
+    def add(self, frames, **channels):
+        self.segments.append((frames, channels))
+        return self
+
+    @property
+    def frames(self):
+        return sum(frames for frames, _ in self.segments)
+
+    def sample(self):
+        """Returns {channel: (frames,) array}."""
+        values = {}
+        for name, value in self.initial.items():
+            current = float(value)
+            parts = []
+            for frames, channels in self.segments:
+                t = np.arange(frames, dtype=np.float64)
+                if name in channels:
+                    part = np.broadcast_to(np.asarray(channels[name](t), dtype=np.float64), t.shape)
+                else:
+                    part = np.full(frames, current)
+                parts.append(part)
+                if frames:
+                    current = part[-1]
+            values[name] = np.concatenate(parts) if parts else np.zeros(0)
+        return values
+
+"""
+Geometry cache
+"""
+
+# Set GPUTIL_GEOMETRY_CACHE to an empty string to turn caching off
+GEOMETRY_CACHE = os.environ.get(
+    "GPUTIL_GEOMETRY_CACHE", os.path.join(tempfile.gettempdir(), "gputil_geometry")
+)
+
+def source_hash(*paths):
+    """Hash of the contents of the files at paths, so cache keys change with code."""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def geometry_cache_path(name, params):
+    """
+    Cache file for name, keyed by a hash of the generating parameters and
+    of the util and gputil sources. Scripts add a source_hash of their own
+    files to params.
+    """
+    code = source_hash(__file__, util.__file__)
+    blob = json.dumps([params, code], sort_keys=True, default=str).encode()
+    return os.path.join(GEOMETRY_CACHE, f"{name}_{hashlib.sha1(blob).hexdigest()[:16]}.npz")
+
+def save_layers(path, layers):
+    """
+    Writes every frame and stroke of layers to an .npz as flat arrays:
+    frame numbers, per-frame stroke offsets, per-stroke point offsets,
+    material indices and line widths, and all point coordinates.
+    """
+    arrays = {}
+    for layer in layers:
+        frame_numbers, frame_offsets = [], [0]
+        point_offsets, materials, widths, co = [0], [], [], []
+        for frame in sorted(layer.frames, key=lambda f: f.frame_number):
+            frame_numbers.append(frame.frame_number)
+            for stroke in frame.strokes:
+                points = np.zeros(len(stroke.points) * 3, dtype=np.float32)
+                stroke.points.foreach_get("co", points)
+                co.append(points)
+                point_offsets.append(point_offsets[-1] + len(stroke.points))
+                materials.append(stroke.material_index)
+                widths.append(stroke.line_width)
+            frame_offsets.append(len(materials))
+        prefix = layer.info
+        arrays[f"{prefix}.frame_numbers"] = np.array(frame_numbers, dtype=np.int32)
+        arrays[f"{prefix}.frame_offsets"] = np.array(frame_offsets, dtype=np.int64)
+        arrays[f"{prefix}.point_offsets"] = np.array(point_offsets, dtype=np.int64)
+        arrays[f"{prefix}.material_index"] = np.array(materials, dtype=np.int32)
+        arrays[f"{prefix}.line_width"] = np.array(widths, dtype=np.int32)
+        arrays[f"{prefix}.co"] = np.concatenate(co) if co else np.zeros(0, dtype=np.float32)
+    # Write to a temporary file and move it into place, so that render
+    # workers sharing the cache never load a half-written file
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npz.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def load_layers(path, layers):
+    """
+    Replaces the contents of layers with geometry written by save_layers.
+    Returns False, leaving layers untouched, if the file is missing or
+    can't be read.
+    """
+    try:
+        with np.load(path) as data:
+            arrays = {
+                layer.info: [data[f"{layer.info}.{key}"] for key in (
+                    "frame_numbers", "frame_offsets", "point_offsets",
+                    "material_index", "line_width", "co",
+                )]
+                for layer in layers
+            }
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return False
+    for layer in layers:
+        frame_numbers, frame_offsets, point_offsets, materials, widths, co = arrays[layer.info]
+        materials = materials.tolist()
+        widths = widths.tolist()
+        clear_layer(layer)
+        for f, n in enumerate(frame_numbers.tolist()):
+            frame = get_frame(layer, n)
+            for i in range(frame_offsets[f], frame_offsets[f + 1]):
+                start, end = point_offsets[i], point_offsets[i + 1]
+                stroke = frame.strokes.new()
+                stroke.display_mode = "3DSPACE"
+                stroke.points.add(count=end - start)
+                stroke.points.foreach_set("co", co[start * 3:end * 3])
+                stroke.line_width = widths[i]
+                stroke.material_index = materials[i]
+    return True
+
+def cached_geometry(name, params, layers, generate):
+    """
+    Loads the geometry of layers from the cache if it was generated before
+    with the same params; otherwise (including when the cached file can't
+    be read) calls generate() and caches the result. Returns True on a
+    cache hit.
+    """
+    path = geometry_cache_path(name, params)
+    if not GEOMETRY_CACHE:
+        generate()
+        return False
+    if load_layers(path, layers):
+        return True
+    generate()
+    save_layers(path, layers)
+    return False
+
+def cached_steps(name, params, layers, steps):
+    """
+    Generator form of cached_geometry for scripts run with util.run_steps:
+    on a cache miss yields from steps() and then caches the result.
+    Returns True on a cache hit.
+    """
+    path = geometry_cache_path(name, params)
+    if not GEOMETRY_CACHE:
+        yield from steps()
+        return False
+    if load_layers(path, layers):
+        return True
+    yield from steps()
+    save_layers(path, layers)
+    return False
 
 """
 Text
 """
 
+# normalized font filepath -> (font name, pointer)
+_fonts = {}
+
+def font_key(path):
+    return os.path.normcase(os.path.realpath(bpy.path.abspath(path)))
+
 def get_font(path):
-    for font in bpy.data.fonts:
-        if font.filepath == path:
-            return font
-    bpy.ops.font.open(filepath=path, relative_path=True)
-    for font in bpy.data.fonts:
-        if font.filepath == path:
+    """
+    Returns the font at path, loading it without an operator if needed,
+    so it also works in background mode. Registered fonts are checked by
+    name and pointer, so removed or renamed fonts are looked up again.
+    """
+    key = font_key(path)
+    entry = _fonts.get(key)
+    if entry is not None:
+        name, pointer = entry
+        font = bpy.data.fonts.get(name)
+        if font is not None and font.as_pointer() == pointer:
             return font
-    return None
+        del _fonts[key]
+    try:
+        font = bpy.data.fonts.load(path, check_existing=True)
+    except RuntimeError:
+        return None
+    _fonts[key] = (font.name, font.as_pointer())
+    return font
+
+def remove_font(font):
+    for key, (name, pointer) in list(_fonts.items()):
+        if pointer == font.as_pointer():
+            del _fonts[key]
+    bpy.data.fonts.remove(font)
+
+
+def get_text_material(color):
+    """
+    Material shared by all text of one color. Alpha comes from each object's
+    color through an Object Info node, so visibility can be animated per
+    object without a material per object.
+    """
+    name = "Text_%g_%g_%g" % tuple(color)
+    mat = bpy.data.materials.get(name)
+    if mat is not None:
+        return mat
+    mat = create_material_3d(name, color=color)
+    mat.blend_method = "BLEND"
+    mat.use_nodes = True
+    mat.show_transparent_back = False
+    nodes = mat.node_tree.nodes
+    bsdf = nodes["Principled BSDF"]
+    bsdf.inputs["Base Color"].default_value = rgb(*color)
+    info = nodes.new("ShaderNodeObjectInfo")
+    # Object Info has no alpha output before 3.0, so the alpha is keyed into
+    # all three channels of the object color, whose gray value it becomes
+    mat.node_tree.links.new(info.outputs["Color"], bsdf.inputs["Alpha"])
+    return mat
 
+def shares_text_material(text):
+    """Whether text's alpha is keyed on the object rather than its material."""
+    mat = text.data.materials[0]
+    return mat.use_nodes and mat.node_tree.nodes.get("Object Info") is not None
+
+def key_text_alpha(text, value, frame):
+    """Keys the alpha of text, whether its material is shared or its own."""
+    if shares_text_material(text):
+        for i in range(3):
+            util.keyframe(text, "color", frame, value, index=i)
+    else:
+        mat = text.data.materials[0]
+        alpha = mat.node_tree.nodes["Principled BSDF"].inputs["Alpha"]
+        util.keyframe(alpha, "default_value", frame, value)
 
-def add_text(name, content, origin=(0, 0), color=(0, 0, 0), size=60, font=None, show_at=None):
+def add_text(name, content, origin=(0, 0), color=(0, 0, 0), size=60, font=None, show_at=None, shared=False):
     curve = bpy.data.curves.new(type="FONT",name=name)
     text = bpy.data.objects.new(name, curve)
+    if instrument.ENABLED:
+        instrument.count("objects")
     text.data.body = content
     bpy.context.collection.objects.link(text)
     text.rotation_euler[0] = math.tau / 4 # rotate to face front
     # Set up material
-    mat = create_material_3d(f"{name}_mat", color=color)
-    mat.blend_method = "BLEND"
-    mat.use_nodes = True
-    mat.show_transparent_back = False
+    if shared:
+        mat = get_text_material(color)
+    else:
+        mat = create_material_3d(f"{name}_mat", color=color)
+        mat.blend_method = "BLEND"
+        mat.use_nodes = True
+        mat.show_transparent_back = False
     text.data.materials.append(mat)
     text.location = pt(*origin)
     set_text_size(text, size)
     if font is not None:
         text.data.font = font
-    alpha = mat.node_tree.nodes["Principled BSDF"].inputs["Alpha"]
     if show_at is None:
         show_at = 1 # show starting from first frame
     elif show_at > 1:
-        alpha.default_value = 0
-        alpha.keyframe_insert("default_value", frame=1)
-        alpha.default_value = 0
-        alpha.keyframe_insert("default_value", frame=show_at - 1)
-    alpha.default_value = 1
-    alpha.keyframe_insert("default_value", frame=show_at)
+        key_text_alpha(text, 0, 1)
+        key_text_alpha(text, 0, show_at - 1)
+    key_text_alpha(text, 1, show_at)
     return text
 
 def hide_text_at(text, hide_at):
-    mat = text.data.materials[0]
-    alpha = mat.node_tree.nodes["Principled BSDF"].inputs["Alpha"]
-    alpha.default_value = 1
-    alpha.keyframe_insert("default_value", frame=hide_at - 1)
-    alpha.default_value = 0
-    alpha.keyframe_insert("default_value", frame=hide_at)
+    key_text_alpha(text, 1, hide_at - 1)
+    key_text_alpha(text, 0, hide_at)
 
 def set_text_size(text, size):
     scale = 0.0066113763385348846 * size
     text.scale = (scale, scale, scale)
 
+METRICS_SIZE = 60
+
+# font filepath -> (line height, char width) in pixels at METRICS_SIZE
+_font_metrics = {}
+
+def font_metrics(font, size):
+    """
+    Returns (line height, char width) in pixels of monospace text at size.
+    Each font is measured once with a temporary text object; text scales
+    linearly with size, so later calls for any size reuse that measurement
+    without a depsgraph update.
+    """
+    path = font.filepath if font is not None else ""
+    metrics = _font_metrics.get(path)
+    if metrics is None:
+        # A bare text object: no material or keyframes to clean up, and
+        # nothing for an active batch to queue
+        sample = "|" * 22
+        curve = bpy.data.curves.new(type="FONT", name="tmp_font_metrics")
+        curve.body = sample
+        if font is not None:
+            curve.font = font
+        text = bpy.data.objects.new("tmp_font_metrics", curve)
+        bpy.context.collection.objects.link(text)
+        set_text_size(text, METRICS_SIZE)
+        bpy.context.view_layer.update()
+        metrics = (
+            from_units(text.dimensions[1]),
+            from_units(text.dimensions[0]) / len(sample)
+        )
+        bpy.data.objects.remove(text)
+        bpy.data.curves.remove(curve)
+        _font_metrics[path] = metrics
+    scale = size / METRICS_SIZE
+    return (metrics[0] * scale, metrics[1] * scale)
+
 """
 3D Objects
 """
@@ -214,3 +759,5 @@ def test3():
     """Testing with fonts."""
     font = get_font("/Users/brian/Library/Fonts/Barlow-Regular.otf")
     text = add_text("Foo", "Hello!", origin=(400, 400), color=(255, 0, 0), size=80, font=font)
+
+instrument.instrument_module(globals())
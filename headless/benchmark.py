@@ -0,0 +1,146 @@
+"""
+Benchmarks the animation scripts against the headless bpy stand-in.
+
+    python headless/benchmark.py [--json results.json] [--baseline old.json]
+
+Each script runs at several sizes from a fresh scene, reporting wall time
+and the RNA-style call counts collected by the stand-in. Inputs are
+seeded, so call counts are deterministic; with --baseline the run fails
+if any count grows by more than --tolerance over the baseline.
+"""
+
+import argparse
+import json
+import os
+import random
+import runpy
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+ANIMATIONS = os.path.join(ROOT, "animations")
+
+sys.path[:0] = [HERE, ROOT, os.path.join(ANIMATIONS, "sorting")]
+
+import bpy
+
+# Modules holding per-run state, reloaded for every run
+MODULES = ("util", "gputil", "sorttrace")
+
+def setup():
+    bpy.reset()
+    for name in MODULES:
+        sys.modules.pop(name, None)
+    # No geometry cache, so repeated and later runs measure generation
+    # rather than loading; gputil reads this on import
+    os.environ["GPUTIL_GEOMETRY_CACHE"] = ""
+    random.seed(0)
+    pencil = bpy.data.grease_pencils.new("Stroke")
+    pencil.layers.new("Lines")
+    bpy.context.scene.collection.objects.link(bpy.data.objects.new("Stroke", pencil))
+
+def run_script(name, run_name="__bench__"):
+    return runpy.run_path(os.path.join(ANIMATIONS, name), run_name=run_name)
+
+def bench_sorting(size):
+    script = run_script("sorting/sorting.py")
+    values = [random.randint(10, 500) for _ in range(size)]
+    with script["batch"]():
+        script["render_trace"](script["trace_sort"]("merge", values))
+
+def bench_sorting_scheduled(size):
+    """bench_sorting run in time slices from the stand-in's timers."""
+    script = run_script("sorting/sorting.py")
+    values = [random.randint(10, 500) for _ in range(size)]
+    trace = script["trace_sort"]("merge", values)
+    steps = script["render_batches"](trace, batch_size=10)
+    script["run_steps"](steps, timers=bpy.app.timers)
+    bpy.app.timers.run()
+
+def bench_nodes(size):
+    for _ in range(size):
+        run_script("nodes/nodes.py")
+
+def bench_codevisualizer(size):
+    script = run_script("codevisualizer/visualizer.py")
+    lines = [("\t" * (i % 4)) + f"int x{i} = {i} * y;" for i in range(size)]
+    script["draw"]([], lines, {})
+
+def bench_codevisualizer_windowed(size):
+    script = run_script("codevisualizer/visualizer.py")
+    script["draw"].__globals__["WINDOW"] = 30
+    lines = [("\t" * (i % 4)) + f"int x{i} = {i} * y;" for i in range(size)]
+    script["draw"]([], lines, {})
+    for frame in range(1, size + 1):
+        bpy.context.scene.frame_set(frame)
+
+BENCHMARKS = {
+    "sorting": (bench_sorting, (20, 40, 80)),
+    "sorting_scheduled": (bench_sorting_scheduled, (20, 40, 80)),
+    "nodes": (bench_nodes, (1, 4, 16)),
+    "codevisualizer": (bench_codevisualizer, (50, 200, 1000)),
+    "codevisualizer_windowed": (bench_codevisualizer_windowed, (50, 200, 1000)),
+}
+
+def run(names=None):
+    results = []
+    for name, (bench, sizes) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        for size in sizes:
+            setup()
+            start = time.perf_counter()
+            bench(size)
+            elapsed = time.perf_counter() - start
+            results.append({
+                "script": name,
+                "size": size,
+                "seconds": elapsed,
+                "calls": dict(sorted(bpy.calls.items())),
+            })
+    return results
+
+def report(results):
+    for result in results:
+        print(f"{result['script']:>16} {result['size']:>6} {result['seconds']:8.3f}s")
+        for call, count in result["calls"].items():
+            print(f"{'':>24}{call:<36}{count:>10}")
+
+def regressions(results, baseline, tolerance):
+    old = {(r["script"], r["size"]): r["calls"] for r in baseline}
+    found = []
+    for result in results:
+        previous = old.get((result["script"], result["size"]))
+        if previous is None:
+            continue
+        for call, count in result["calls"].items():
+            limit = previous.get(call, 0) * (1 + tolerance)
+            if count > limit:
+                found.append(f"{result['script']}@{result['size']}: {call} "
+                             f"{previous.get(call, 0)} -> {count}")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scripts", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare call counts against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run(args.scripts)
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"regression: {line}")
+        if found:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,881 @@
+"""
+Headless stand-in for bpy.
+
+Models just enough of Blender's data (objects, grease pencil layers, frames
+and strokes, materials, text curves, fonts and F-curves) to run util,
+gputil and the animation scripts without Blender, and counts every
+RNA-style call in `calls` so benchmarks can track the hot paths.
+Geometry is not evaluated; text dimensions are approximated.
+"""
+
+import itertools
+import os
+import types
+from collections import Counter
+
+calls = Counter()
+
+_pointers = itertools.count(1)
+
+"""
+Structs
+"""
+
+class Struct():
+    """Base for RNA structs: pointer, ID ownership and custom properties."""
+
+    def __init__(self, id_data=None, path=""):
+        self._pointer = next(_pointers)
+        self._id_data = id_data if id_data is not None else self
+        self._path = path
+        self._props = {}
+
+    @property
+    def id_data(self):
+        return self._id_data
+
+    def as_pointer(self):
+        return self._pointer
+
+    def path_from_id(self, prop=None):
+        if prop is None:
+            return self._path
+        return f"{self._path}.{prop}" if self._path else prop
+
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value):
+        self._props[key] = value
+
+    def __contains__(self, key):
+        return key in self._props
+
+    def keyframe_insert(self, data_path, index=-1, frame=None):
+        calls["keyframe_insert"] += 1
+        if frame is None:
+            frame = context.scene.frame_current
+        if data_path.startswith("["):
+            values = [self._props[data_path[2:-2]]]
+        else:
+            value = getattr(self, data_path)
+            values = list(value) if isinstance(value, (list, tuple)) else [value]
+        indices = range(len(values)) if index < 0 else [index]
+        path = self.path_from_id(data_path) if not data_path.startswith("[") \
+            else self._path + data_path
+        for i in indices:
+            fcurve = _action_for(self.id_data).fcurves.find(path, index=i)
+            if fcurve is None:
+                fcurve = _action_for(self.id_data).fcurves.new(path, index=i)
+            fcurve.keyframe_points.insert(frame, float(values[i]))
+        return True
+
+class ID(Struct):
+
+    def __init__(self, name):
+        super().__init__()
+        self._owner = None
+        self._name = name
+        self.users = 1
+        self.animation_data = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if value == self._name:
+            return
+        if self._owner is not None:
+            self._owner._rename(self, value)
+        else:
+            self._name = value
+
+    def animation_data_create(self):
+        if self.animation_data is None:
+            self.animation_data = AnimData()
+        return self.animation_data
+
+    def copy(self):
+        calls["id.copy"] += 1
+        dup = type(self).__new__(type(self))
+        dup.__dict__.update(self.__dict__)
+        dup._pointer = next(_pointers)
+        dup._id_data = dup
+        dup._props = dict(self._props)
+        dup._owner = None
+        dup.animation_data = None
+        return dup
+
+def _action_for(id_data):
+    anim = id_data.animation_data_create()
+    if anim.action is None:
+        anim.action = data.actions.new(f"{id_data.name}Action")
+    return anim.action
+
+class Collection(list):
+    """bpy_prop_collection over a list of named items."""
+
+    def get(self, key, default=None):
+        for item in self:
+            if item.name == key:
+                return item
+        return default
+
+    def find(self, key):
+        calls["collection.find"] += 1
+        for i, item in enumerate(self):
+            if item.name == key:
+                return i
+        return -1
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            item = self.get(key)
+            if item is None:
+                raise KeyError(key)
+            return item
+        return list.__getitem__(self, key)
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self.get(key) is not None
+        return list.__contains__(self, key)
+
+class IDCollection(Collection):
+    """
+    bpy.data.<type>, creating IDs of one class with unique names. Names are
+    indexed so lookups and new() don't scan the whole collection.
+    """
+
+    def __init__(self, cls):
+        super().__init__()
+        self.cls = cls
+        self._names = {}
+
+    def get(self, key, default=None):
+        return self._names.get(key, default)
+
+    def find(self, key):
+        calls["collection.find"] += 1
+        item = self._names.get(key)
+        return -1 if item is None else self.index(item)
+
+    def unique_name(self, name):
+        if name not in self._names:
+            return name
+        for i in itertools.count(1):
+            candidate = f"{name}.{i:03d}"
+            if candidate not in self._names:
+                return candidate
+
+    def append(self, item):
+        item._name = self.unique_name(item.name)
+        item._owner = self
+        self._names[item.name] = item
+        list.append(self, item)
+
+    def new(self, name, *args, **kwargs):
+        calls[f"{self.cls.__name__.lower()}.new"] += 1
+        item = self.cls(name, *args, **kwargs)
+        self.append(item)
+        return item
+
+    def remove(self, item, **kwargs):
+        calls[f"{self.cls.__name__.lower()}.remove"] += 1
+        list.remove(self, item)
+        del self._names[item.name]
+        item._owner = None
+
+    def _rename(self, item, name):
+        del self._names[item.name]
+        item._name = self.unique_name(name)
+        self._names[item.name] = item
+
+"""
+Animation
+"""
+
+class Keyframe():
+
+    def __init__(self, frame=0.0, value=0.0):
+        self.co = [frame, value]
+        self.interpolation = "BEZIER"
+
+class KeyframePoints(list):
+
+    def add(self, count=1):
+        calls["keyframe_points.add"] += 1
+        self.extend(Keyframe() for _ in range(count))
+
+    def insert(self, frame, value, options=set()):
+        for point in self:
+            if point.co[0] == frame:
+                point.co[1] = value
+                return point
+        point = Keyframe(frame, value)
+        self.append(point)
+        self.sort(key=lambda p: p.co[0])
+        return point
+
+    def remove(self, point, fast=False):
+        list.remove(self, point)
+
+    def foreach_get(self, attr, seq):
+        calls["keyframe_points.foreach_get"] += 1
+        flat = [c for point in self for c in _flat(getattr(point, attr))]
+        seq[:len(flat)] = flat
+
+    def foreach_set(self, attr, seq):
+        calls["keyframe_points.foreach_set"] += 1
+        seq = list(seq)
+        width = len(seq) // len(self) if self else 0
+        for i, point in enumerate(self):
+            value = seq[i * width:(i + 1) * width]
+            setattr(point, attr, value if width > 1 else value[0])
+
+def _flat(value):
+    return value if isinstance(value, (list, tuple)) else [value]
+
+class FCurve():
+
+    def __init__(self, data_path, index=0, action_group=""):
+        self.data_path = data_path
+        self.array_index = index
+        self.group = action_group
+        self.keyframe_points = KeyframePoints()
+
+    def update(self):
+        calls["fcurve.update"] += 1
+        self.keyframe_points.sort(key=lambda p: p.co[0])
+
+    def evaluate(self, frame):
+        value = None
+        for point in self.keyframe_points:
+            if point.co[0] > frame:
+                break
+            value = point.co[1]
+        return value
+
+class FCurves(list):
+
+    def find(self, data_path, index=0):
+        for fcurve in self:
+            if fcurve.data_path == data_path and fcurve.array_index == index:
+                return fcurve
+        return None
+
+    def new(self, data_path, index=0, action_group=""):
+        calls["fcurves.new"] += 1
+        if self.find(data_path, index) is not None:
+            raise RuntimeError(f"F-Curve '{data_path}[{index}]' already exists")
+        fcurve = FCurve(data_path, index, action_group)
+        self.append(fcurve)
+        return fcurve
+
+    def remove(self, fcurve):
+        list.remove(self, fcurve)
+
+class Action(ID):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.fcurves = FCurves()
+
+    @property
+    def frame_range(self):
+        frames = [p.co[0] for fcurve in self.fcurves for p in fcurve.keyframe_points]
+        return (min(frames), max(frames)) if frames else (0.0, 0.0)
+
+class NlaStrip():
+
+    def __init__(self, name, start, action):
+        self.name = name
+        self.action = action
+        self.action_frame_start, self.action_frame_end = action.frame_range
+        self.frame_start = float(start)
+        self.frame_end = self.frame_start + self.action_frame_end - self.action_frame_start
+        self.extrapolation = "HOLD"
+        self.blend_type = "REPLACE"
+        self.influence = 1.0
+
+class NlaStrips(list):
+
+    def new(self, name, start, action):
+        calls["nla_strips.new"] += 1
+        strip = NlaStrip(name, start, action)
+        for other in self:
+            if strip.frame_start <= other.frame_end and other.frame_start <= strip.frame_end:
+                raise RuntimeError("Unable to add strip (the track does not have any space to accommodate this new strip)")
+        self.append(strip)
+        self.sort(key=lambda s: s.frame_start)
+        return strip
+
+class NlaTrack():
+
+    def __init__(self):
+        self.name = "NlaTrack"
+        self.strips = NlaStrips()
+        self.mute = False
+
+class NlaTracks(list):
+
+    def new(self, prev=None):
+        calls["nla_tracks.new"] += 1
+        track = NlaTrack()
+        self.append(track)
+        return track
+
+class AnimData():
+
+    def __init__(self):
+        self.action = None
+        self.nla_tracks = NlaTracks()
+
+"""
+Grease pencil
+"""
+
+class Point():
+
+    def __init__(self):
+        self._co = (0.0, 0.0, 0.0)
+
+    @property
+    def co(self):
+        return self._co
+
+    @co.setter
+    def co(self, value):
+        calls["point.co"] += 1
+        self._co = tuple(value)
+
+class Points(list):
+
+    def add(self, count=1):
+        calls["points.add"] += 1
+        self.extend(Point() for _ in range(count))
+
+    def foreach_set(self, attr, seq):
+        calls["points.foreach_set"] += 1
+        seq = list(seq)
+        for i, point in enumerate(self):
+            point._co = tuple(seq[i * 3:i * 3 + 3])
+
+    def foreach_get(self, attr, seq):
+        calls["points.foreach_get"] += 1
+        flat = [c for point in self for c in point._co]
+        seq[:len(flat)] = flat
+
+class Stroke(Struct):
+
+    def __init__(self):
+        super().__init__()
+        self.points = Points()
+        self.display_mode = "SCREEN"
+        self.line_width = 0
+        self.material_index = 0
+
+class Strokes(list):
+
+    def new(self):
+        calls["strokes.new"] += 1
+        stroke = Stroke()
+        self.append(stroke)
+        return stroke
+
+    def remove(self, stroke):
+        list.remove(self, stroke)
+
+class Frame(Struct):
+
+    def __init__(self, frame_number):
+        super().__init__()
+        self.frame_number = frame_number
+        self.strokes = Strokes()
+
+class Frames(list):
+
+    def new(self, frame_number, active=False):
+        calls["frames.new"] += 1
+        if any(frame.frame_number == frame_number for frame in self):
+            raise RuntimeError(f"Frame already exists on this frame number {frame_number}")
+        frame = Frame(frame_number)
+        self.append(frame)
+        return frame
+
+    def remove(self, frame):
+        list.remove(self, frame)
+
+class Layer(Struct):
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.info = name
+        self.frames = Frames()
+
+    def clear(self):
+        calls["layer.clear"] += 1
+        self.frames.clear()
+
+class Layers(Collection):
+
+    def new(self, name, set_active=False):
+        calls["layers.new"] += 1
+        layer = Layer(name)
+        self.append(layer)
+        return layer
+
+class MaterialSlots(Collection):
+
+    def __init__(self, owner=None):
+        super().__init__()
+        self.owner = owner
+
+    def append(self, material):
+        calls["materials.append"] += 1
+        if material is not None:
+            material.users += 1
+        list.append(self, material)
+
+    def pop(self, index=-1):
+        calls["materials.pop"] += 1
+        index %= len(self)
+        material = list.pop(self, index)
+        if material is not None:
+            material.users -= 1
+        # Like Blender, strokes using later slots move down one
+        if isinstance(self.owner, GreasePencil):
+            for layer in self.owner.layers:
+                for frame in layer.frames:
+                    for stroke in frame.strokes:
+                        if stroke.material_index > index:
+                            stroke.material_index -= 1
+        return material
+
+class GreasePencil(ID):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.layers = Layers()
+        self.materials = MaterialSlots(self)
+
+"""
+Materials
+"""
+
+class Socket(Struct):
+
+    def __init__(self, id_data, path, name, default_value=0.0):
+        super().__init__(id_data, path)
+        self.name = name
+        self.default_value = default_value
+
+class Node(Struct):
+
+    def __init__(self, tree, name, inputs=(), outputs=()):
+        super().__init__(tree, f'nodes["{name}"]')
+        self.name = name
+        self.inputs = Collection(
+            Socket(tree, f'{self._path}.inputs[{i}]', n, v)
+            for i, (n, v) in enumerate(inputs)
+        )
+        self.outputs = Collection(
+            Socket(tree, f'{self._path}.outputs[{i}]', n, v)
+            for i, (n, v) in enumerate(outputs)
+        )
+        self.attribute_type = "GEOMETRY"
+        self.attribute_name = ""
+
+NODE_TYPES = {
+    "ShaderNodeBsdfPrincipled": ("Principled BSDF",
+        (("Base Color", (0.8, 0.8, 0.8, 1)), ("Alpha", 1.0)), (("BSDF", None),)),
+    "ShaderNodeAttribute": ("Attribute",
+        (), (("Color", None), ("Vector", None), ("Fac", 0.0))),
+    "ShaderNodeObjectInfo": ("Object Info",
+        (), (("Location", None), ("Color", None), ("Object Index", 0.0),
+            ("Material Index", 0.0), ("Random", 0.0))),
+    "ShaderNodeValue": ("Value", (), (("Value", 0.0),)),
+    "ShaderNodeOutputMaterial": ("Material Output", (("Surface", None),), ()),
+}
+
+class Nodes(Collection):
+
+    def __init__(self, tree):
+        super().__init__()
+        self.tree = tree
+
+    def new(self, type):
+        calls["nodes.new"] += 1
+        name, inputs, outputs = NODE_TYPES[type]
+        base, i = name, 0
+        while self.get(name) is not None:
+            i += 1
+            name = f"{base}.{i:03d}"
+        node = Node(self.tree, name, inputs, outputs)
+        self.append(node)
+        return node
+
+class Links(list):
+
+    def new(self, output, input):
+        calls["links.new"] += 1
+        link = types.SimpleNamespace(from_socket=output, to_socket=input)
+        self.append(link)
+        return link
+
+class NodeTree(ID):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.nodes = Nodes(self)
+        self.links = Links()
+
+class Material(ID):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.users = 0
+        self.diffuse_color = (0.8, 0.8, 0.8, 1)
+        self.blend_method = "OPAQUE"
+        self.show_transparent_back = True
+        self.grease_pencil = None
+        self.node_tree = None
+        self._use_nodes = False
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        self._use_nodes = value
+        if value and self.node_tree is None:
+            self.node_tree = NodeTree("Shader Nodetree")
+            self.node_tree.nodes.new("ShaderNodeBsdfPrincipled")
+            self.node_tree.nodes.new("ShaderNodeOutputMaterial")
+
+    def copy(self):
+        dup = super().copy()
+        dup.name = data.materials.unique_name(self.name)
+        data.materials.append(dup)
+        return dup
+
+class Materials(IDCollection):
+
+    def __init__(self):
+        super().__init__(Material)
+
+    def create_gpencil_data(self, material):
+        calls["materials.create_gpencil_data"] += 1
+        material.grease_pencil = types.SimpleNamespace(
+            color=(0, 0, 0, 1), fill_color=(0, 0, 0, 0),
+            show_stroke=True, show_fill=False
+        )
+
+"""
+Objects
+"""
+
+class MaterialSlot(Struct):
+
+    def __init__(self, owner, index):
+        super().__init__(owner.id_data, f"material_slots[{index}]")
+        self.owner = owner
+        self.index = index
+        self.link = "DATA"
+        self._material = None
+
+    @property
+    def material(self):
+        if self.link == "OBJECT":
+            return self._material
+        return self.owner.data.materials[self.index]
+
+    @material.setter
+    def material(self, value):
+        if self.link == "OBJECT":
+            self._material = value
+        else:
+            materials = self.owner.data.materials
+            if materials[self.index] is not None:
+                materials[self.index].users -= 1
+            if value is not None:
+                value.users += 1
+            materials[self.index] = value
+
+class Matrix(list):
+
+    def inverted(self):
+        return Matrix(self)
+
+class Object(ID):
+
+    def __init__(self, name, object_data=None):
+        super().__init__(name)
+        self.data = object_data
+        self.location = [0.0, 0.0, 0.0]
+        self.rotation_euler = [0.0, 0.0, 0.0]
+        self._scale = [1.0, 1.0, 1.0]
+        self.color = [1.0, 1.0, 1.0, 1.0]
+        self.hide_viewport = False
+        self.hide_render = False
+        self._parent = None
+        self._has_children = False
+        self.matrix_world = Matrix()
+        self.matrix_parent_inverse = Matrix()
+        self.instance_type = "NONE"
+        self.instance_collection = None
+        self.rigid_body = None
+        self._slots = {}
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._scale = list(value)
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, value):
+        self._parent = value
+        if value is not None:
+            value._has_children = True
+
+    @property
+    def children(self):
+        if not self._has_children:
+            return ()
+        return tuple(obj for obj in data.objects if obj.parent is self)
+
+    @property
+    def material_slots(self):
+        materials = getattr(self.data, "materials", [])
+        return [self._slots.setdefault(i, MaterialSlot(self, i)) for i in range(len(materials))]
+
+    @property
+    def dimensions(self):
+        body = getattr(self.data, "body", None)
+        if body is None:
+            return (0.0, 0.0, 0.0)
+        # Rough monospace metrics for text at scale 1
+        return (0.6 * len(body) * self.scale[0], 0.7 * self.scale[1], 0.0)
+
+    def copy(self):
+        dup = super().copy()
+        dup.name = data.objects.unique_name(self.name)
+        dup.location = list(self.location)
+        dup.rotation_euler = list(self.rotation_euler)
+        dup._scale = list(self._scale)
+        dup.color = list(self.color)
+        dup._slots = {}
+        dup._has_children = False
+        data.objects.append(dup)
+        return dup
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+class Objects(IDCollection):
+
+    def __init__(self):
+        super().__init__(Object)
+
+    def remove(self, obj, **kwargs):
+        super().remove(obj)
+        for coll in [context.scene.collection] + list(data.collections):
+            if obj in coll.objects:
+                list.remove(coll.objects, obj)
+
+class CollectionObjects(list):
+
+    def link(self, obj):
+        calls["objects.link"] += 1
+        self.append(obj)
+
+    def unlink(self, obj):
+        list.remove(self, obj)
+
+class SceneCollection(ID):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = CollectionObjects()
+        self.instance_offset = (0.0, 0.0, 0.0)
+
+class Mesh(ID):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.materials = MaterialSlots()
+
+class Curve(ID):
+
+    def __init__(self, name, type="CURVE"):
+        super().__init__(name)
+        self.type = type
+        self.body = ""
+        self.font = None
+        self.materials = MaterialSlots()
+
+class Font(ID):
+
+    def __init__(self, name, filepath=""):
+        super().__init__(name)
+        self.filepath = filepath
+
+class Fonts(IDCollection):
+
+    def __init__(self):
+        super().__init__(Font)
+
+    def load(self, filepath, check_existing=False):
+        calls["fonts.load"] += 1
+        if check_existing:
+            for font in self:
+                if font.filepath == filepath:
+                    return font
+        return self.new(os.path.splitext(os.path.basename(filepath))[0], filepath)
+
+class BlendData():
+
+    def __init__(self):
+        self.objects = Objects()
+        self.meshes = IDCollection(Mesh)
+        self.curves = IDCollection(Curve)
+        self.fonts = Fonts()
+        self.materials = Materials()
+        self.grease_pencils = IDCollection(GreasePencil)
+        self.actions = IDCollection(Action)
+        self.collections = IDCollection(SceneCollection)
+
+    def batch_remove(self, ids):
+        for item in ids:
+            for name in ("objects", "meshes", "curves", "fonts", "materials",
+                    "grease_pencils", "actions", "collections"):
+                coll = getattr(self, name)
+                if item in coll:
+                    coll.remove(item)
+                    break
+
+"""
+Context
+"""
+
+class ViewLayer():
+
+    def __init__(self, collection):
+        self.active_layer_collection = types.SimpleNamespace(collection=collection)
+
+    def update(self):
+        calls["view_layer.update"] += 1
+
+class Scene(ID):
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.collection = SceneCollection("Scene Collection")
+        self.frame_current = 1
+        self.frame_start = 1
+        self.frame_end = 250
+
+    def frame_set(self, frame, subframe=0.0):
+        # As in Blender, pre handlers already see the new frame
+        self.frame_current = frame
+        for handler in list(app.handlers.frame_change_pre):
+            handler(self)
+        for handler in list(app.handlers.frame_change_post):
+            handler(self)
+
+    @property
+    def objects(self):
+        return list(self.collection.objects)
+
+class Context():
+
+    def __init__(self):
+        self.scene = Scene("Scene")
+        self.view_layer = ViewLayer(self.scene.collection)
+        self.collection = self.scene.collection
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in data.objects if obj._props.get("_selected")]
+
+def _persistent(function):
+    function._bpy_persistent = True
+    return function
+
+def _handlers():
+    return types.SimpleNamespace(
+        frame_change_pre=[], frame_change_post=[], depsgraph_update_post=[],
+        persistent=_persistent
+    )
+
+def _abspath(path, start=None, library=None):
+    if path.startswith("//"):
+        return os.path.join(start or os.getcwd(), path[2:])
+    return path
+
+class Timers():
+    """bpy.app.timers, run by calling run() instead of by an event loop."""
+
+    def __init__(self):
+        self.clock = 0.0
+        # function -> time of its next call
+        self.due = {}
+
+    def register(self, function, first_interval=0, persistent=False):
+        self.due[function] = self.clock + first_interval
+
+    def unregister(self, function):
+        del self.due[function]
+
+    def is_registered(self, function):
+        return function in self.due
+
+    def run(self, limit=None):
+        """
+        Calls registered functions in order of their due time, advancing a
+        simulated clock, until none are left or limit calls were made.
+        Returns the number of calls.
+        """
+        made = 0
+        while self.due and (limit is None or made < limit):
+            function = min(self.due, key=self.due.get)
+            self.clock = max(self.clock, self.due[function])
+            interval = function()
+            made += 1
+            if interval is None:
+                self.due.pop(function, None)
+            else:
+                self.due[function] = self.clock + interval
+        return made
+
+path = types.SimpleNamespace(abspath=_abspath)
+app = types.SimpleNamespace(
+    background=True, version=(2, 83, 0), timers=Timers(),
+    handlers=_handlers(),
+)
+ops = types.SimpleNamespace()
+
+data = None
+context = None
+
+def reset():
+    """Starts over with empty data, an empty scene and zeroed call counts."""
+    global data, context
+    data = BlendData()
+    context = Context()
+    app.timers = Timers()
+    app.handlers = _handlers()
+    calls.clear()
+
+reset()
@@ -0,0 +1,42 @@
+"""
+Stands in for a `blender -b` render worker in render.py.
+
+    python headless/stub_render.py <output> <start> <end> [--skip N] [--fail-once FILE] [--log FILE]
+
+Writes frame start..end as <output> with ###### replaced by the frame
+number, each holding the worker's RENDER_SEED. --skip leaves out a frame,
+--fail-once exits with an error unless FILE exists, creating it so only
+one worker fails, and --log appends "start end" for every run.
+"""
+
+import argparse
+import os
+import sys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output")
+    parser.add_argument("start", type=int)
+    parser.add_argument("end", type=int)
+    parser.add_argument("--skip", type=int, action="append", default=[])
+    parser.add_argument("--fail-once", default=None)
+    parser.add_argument("--log", default=None)
+    args = parser.parse_args(argv)
+    if args.log is not None:
+        with open(args.log, "a") as f:
+            f.write(f"{args.start} {args.end}\n")
+    if args.fail_once is not None:
+        try:
+            os.close(os.open(args.fail_once, os.O_CREAT | os.O_EXCL))
+            return 1
+        except FileExistsError:
+            pass
+    for n in range(args.start, args.end + 1):
+        if n in args.skip:
+            continue
+        with open(args.output.replace("######", f"{n:06d}") + ".png", "w") as f:
+            f.write(os.environ.get("RENDER_SEED", ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
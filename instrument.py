@@ -0,0 +1,94 @@
+"""
+Opt-in instrumentation for util and gputil.
+
+Set BLENDER_PROFILE=1 before the modules are imported to wrap every public
+helper with a timer. Per-helper call counts, cumulative and self time,
+and counts of created objects, strokes, frames and materials are then
+collected and written at exit (or by report()) as BLENDER_PROFILE_OUT.json
+and as BLENDER_PROFILE_OUT.folded, a folded-stack file for flamegraph.pl
+or speedscope. When disabled, modules are left untouched.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+ENABLED = os.environ.get("BLENDER_PROFILE", "") not in ("", "0")
+OUTPUT = os.environ.get("BLENDER_PROFILE_OUT", "profile")
+
+# helper -> [calls, total seconds, self seconds]
+stats = defaultdict(lambda: [0, 0.0, 0.0])
+# "outer;inner" -> self seconds
+stacks = Counter()
+created = Counter()
+
+_stack = []
+
+def count(kind, n=1):
+    """Records n created things of kind. Callers guard with `if instrument.ENABLED`."""
+    created[kind] += n
+
+def wrap(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # frame: [name, time spent in nested helpers]
+        frame = [name, 0.0]
+        _stack.append(frame)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _stack.pop()
+            own = elapsed - frame[1]
+            entry = stats[name]
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] += own
+            stacks[";".join(f[0] for f in _stack) + (";" if _stack else "") + name] += own
+            if _stack:
+                _stack[-1][1] += elapsed
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+def instrument_module(namespace):
+    """Wraps the public functions defined in a module, given its globals()."""
+    if not ENABLED:
+        return
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (name.startswith("_") or not inspect.isfunction(value)
+                or value.__module__ != module or value.__name__ == "<lambda>"):
+            continue
+        namespace[name] = wrap(f"{module}.{name}", value)
+
+def reset():
+    stats.clear()
+    stacks.clear()
+    created.clear()
+
+def report(path=OUTPUT):
+    """Writes path.json and path.folded and returns the report."""
+    result = {
+        "helpers": {
+            name: {"calls": calls, "total": total, "self": own}
+            for name, (calls, total, own) in sorted(
+                stats.items(), key=lambda item: -item[1][1]
+            )
+        },
+        "created": dict(created),
+    }
+    with open(f"{path}.json", "w") as f:
+        json.dump(result, f, indent=2)
+    with open(f"{path}.folded", "w") as f:
+        for stack, seconds in sorted(stacks.items()):
+            # flame graph values are integers; use microseconds
+            f.write(f"{stack} {max(1, round(seconds * 1e6))}\n")
+    return result
+
+if ENABLED:
+    atexit.register(report)
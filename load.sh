@@ -1,2 +1,5 @@
-cp util.py /Applications/Blender.app/Contents/Resources/2.83/scripts/modules/
-cp gputil.py /Applications/Blender.app/Contents/Resources/2.83/scripts/modules/
+MODULES=${BLENDER_MODULES:-/Applications/Blender.app/Contents/Resources/2.83/scripts/modules}
+cp util.py "$MODULES/"
+cp gputil.py "$MODULES/"
+cp animations/sorting/sorttrace.py "$MODULES/"
+cp instrument.py "$MODULES/"
@@ -0,0 +1,310 @@
+"""
+Previews an animation script as SVG or PNG frames without Blender.
+
+    python preview.py animations/sorting/sorting.py --format png -o preview
+
+The script runs against the headless bpy stand-in (headless/bpy.py) in a
+scene with the "Stroke" grease pencil and "Lines" layer the scripts
+expect. Every grease pencil layer and text object is then drawn per frame
+by a backend: SVG, or PNG rasterized with NumPy. Grease pencil holds,
+fills, strokes and text alpha are followed; stroke widths are approximate
+and PNG output draws each line of text as a box over where its characters
+would be. The export functions only read data through
+the regular bpy API, so they can also be used from inside Blender.
+"""
+
+import argparse
+import os
+import runpy
+import struct
+import sys
+import zlib
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+WIDTH = 1920
+HEIGHT = 1080
+STROKE_SCALE = 0.1 # approximate pixels per unit of grease pencil line_width
+BACKGROUND = (1.0, 1.0, 1.0)
+# Approximate monospace character width, cap height and line spacing of the
+# PNG backend's text boxes, per pixel of font size
+TEXT_WIDTH = 0.6
+TEXT_HEIGHT = 0.7
+TEXT_LINE = 1.2
+
+"""
+Scene
+"""
+
+def layer_frame(layer, n):
+    """Frame shown by layer at n: the last keyframe at or before n."""
+    shown = None
+    for frame in layer.frames:
+        if frame.frame_number <= n and (shown is None or frame.frame_number > shown.frame_number):
+            shown = frame
+    return shown
+
+def animated(id_data, data_path, n, default):
+    anim = getattr(id_data, "animation_data", None)
+    if anim is not None and anim.action is not None:
+        fcurve = anim.action.fcurves.find(data_path)
+        if fcurve is not None:
+            return fcurve.evaluate(n)
+    return default
+
+def shapes(n):
+    """
+    Yields (points, fill, stroke, width) for every stroke shown at frame n,
+    bottom layer first: an (k, 2) array of pixels, fill and stroke colors
+    as RGBA tuples or None, and stroke width in pixels.
+    """
+    import bpy
+    from gputil import from_pts
+    for pencil in bpy.data.grease_pencils:
+        for layer in pencil.layers:
+            frame = layer_frame(layer, n)
+            if frame is None:
+                continue
+            for stroke in frame.strokes:
+                co = np.zeros(len(stroke.points) * 3, dtype=np.float32)
+                stroke.points.foreach_get("co", co)
+                if not len(co):
+                    continue
+                style = pencil.materials[stroke.material_index].grease_pencil
+                yield (
+                    from_pts(co),
+                    tuple(style.fill_color) if style.show_fill else None,
+                    tuple(style.color) if style.show_stroke else None,
+                    stroke.line_width * STROKE_SCALE,
+                )
+
+def texts(n):
+    """Yields (x, y, size, content, rgba) for every text object visible at frame n."""
+    import bpy
+    from gputil import UNIT_SCALE, from_pt, shares_text_material
+    for obj in bpy.data.objects:
+        body = getattr(obj.data, "body", None)
+        if not body or obj.hide_render:
+            continue
+        mat = obj.data.materials[0] if len(obj.data.materials) else None
+        color, alpha = (0, 0, 0, 1), 1
+        if mat is not None and mat.use_nodes:
+            bsdf = mat.node_tree.nodes["Principled BSDF"]
+            color = tuple(bsdf.inputs["Base Color"].default_value)
+            socket = bsdf.inputs["Alpha"]
+            alpha = animated(socket.id_data, socket.path_from_id("default_value"), n, socket.default_value)
+        elif mat is not None:
+            color = tuple(mat.diffuse_color)
+        if mat is not None and shares_text_material(obj):
+            alpha = animated(obj, "color", n, obj.color[0])
+        if alpha <= 0:
+            continue
+        x, y = from_pt(obj.location)
+        # a font size of one unit spans obj.scale units
+        yield x, y, obj.scale[0] / UNIT_SCALE, body, color[:3] + (alpha,)
+
+def last_frame():
+    import bpy
+    numbers = [
+        frame.frame_number
+        for pencil in bpy.data.grease_pencils
+        for layer in pencil.layers
+        for frame in layer.frames
+    ]
+    return max(numbers, default=1)
+
+"""
+Backends
+"""
+
+def hex_color(rgba):
+    return "#%02x%02x%02x" % tuple(round(min(max(c, 0), 1) * 255) for c in rgba[:3])
+
+class SVGBackend():
+
+    extension = "svg"
+
+    def __init__(self, scale=1.0):
+        self.scale = scale
+
+    def write(self, n, path):
+        out = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH * self.scale:g}" '
+            f'height="{HEIGHT * self.scale:g}" viewBox="0 0 {WIDTH} {HEIGHT}">',
+            f'<rect width="100%" height="100%" fill="{hex_color(BACKGROUND)}"/>',
+        ]
+        for points, fill, stroke, width in shapes(n):
+            d = " ".join(f"{x:.1f},{HEIGHT - y:.1f}" for x, y in points)
+            attrs = [f'points="{d}"']
+            if fill is not None:
+                attrs.append(f'fill="{hex_color(fill)}" fill-opacity="{fill[3]:g}"')
+            else:
+                attrs.append('fill="none"')
+            if stroke is not None:
+                attrs.append(
+                    f'stroke="{hex_color(stroke)}" stroke-opacity="{stroke[3]:g}" '
+                    f'stroke-width="{width:g}" stroke-linejoin="round" stroke-linecap="round"'
+                )
+            out.append(f'<polyline {" ".join(attrs)}/>')
+        for x, y, size, content, rgba in texts(n):
+            out.append(
+                f'<text x="{x:.1f}" y="{HEIGHT - y:.1f}" font-size="{size:.1f}" '
+                f'font-family="monospace" fill="{hex_color(rgba)}" fill-opacity="{rgba[3]:g}" '
+                f'xml:space="preserve">{escape(content.replace(chr(9), "    "))}</text>'
+            )
+        out.append("</svg>\n")
+        with open(path, "w") as f:
+            f.write("\n".join(out))
+
+class PNGBackend():
+
+    extension = "png"
+
+    def __init__(self, scale=0.5):
+        self.scale = scale
+        self.width = round(WIDTH * scale)
+        self.height = round(HEIGHT * scale)
+
+    def pixels(self, points):
+        """Pixel coordinates (origin bottom left) to image coordinates."""
+        return np.stack((points[:, 0] * self.scale, (HEIGHT - points[:, 1]) * self.scale), axis=1)
+
+    def region(self, lo, hi):
+        x0, y0 = np.maximum(np.floor(lo).astype(int), 0)
+        x1 = min(int(np.ceil(hi[0])) + 1, self.width)
+        y1 = min(int(np.ceil(hi[1])) + 1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        ys, xs = np.mgrid[y0:y1, x0:x1] + 0.5
+        return (slice(y0, y1), slice(x0, x1)), xs, ys
+
+    def fill(self, image, poly, rgba):
+        region = self.region(poly.min(axis=0), poly.max(axis=0))
+        if region is None:
+            return
+        window, xs, ys = region
+        inside = np.zeros(xs.shape, dtype=bool)
+        for (ax, ay), (bx, by) in zip(poly, np.roll(poly, -1, axis=0)):
+            if ay == by:
+                continue
+            crosses = (ay > ys) != (by > ys)
+            inside ^= crosses & (xs < ax + (ys - ay) * (bx - ax) / (by - ay))
+        self.blend(image, window, inside, rgba)
+
+    def stroke(self, image, line, width, rgba):
+        radius = max(width * self.scale / 2, 0.5)
+        region = self.region(line.min(axis=0) - radius, line.max(axis=0) + radius)
+        if region is None:
+            return
+        window, xs, ys = region
+        covered = np.zeros(xs.shape, dtype=bool)
+        for (ax, ay), (bx, by) in zip(line[:-1], line[1:]):
+            dx, dy = bx - ax, by - ay
+            length = dx * dx + dy * dy
+            t = 0 if length == 0 else np.clip(((xs - ax) * dx + (ys - ay) * dy) / length, 0, 1)
+            covered |= (xs - ax - t * dx) ** 2 + (ys - ay - t * dy) ** 2 <= radius * radius
+        self.blend(image, window, covered, rgba)
+
+    def text(self, image, x, y, size, content, rgba):
+        """Boxes the characters of each line of content, in monospace metrics."""
+        for row, line in enumerate(content.replace("\t", "    ").split("\n")):
+            stripped = line.strip()
+            if not stripped:
+                continue
+            left = x + (len(line) - len(line.lstrip())) * TEXT_WIDTH * size
+            base = y - row * TEXT_LINE * size
+            box = self.pixels(np.array([
+                (left, base),
+                (left + len(stripped) * TEXT_WIDTH * size, base + TEXT_HEIGHT * size),
+            ]))
+            region = self.region(box.min(axis=0), box.max(axis=0))
+            if region is not None:
+                window, xs, _ = region
+                self.blend(image, window, np.ones(xs.shape, dtype=bool), rgba)
+
+    def blend(self, image, window, mask, rgba):
+        alpha = mask[..., None] * rgba[3]
+        image[window] = image[window] * (1 - alpha) + np.array(rgba[:3]) * alpha
+
+    def write(self, n, path):
+        image = np.empty((self.height, self.width, 3))
+        image[:] = BACKGROUND
+        for points, fill, stroke, width in shapes(n):
+            poly = self.pixels(points)
+            if fill is not None and len(poly) > 2:
+                self.fill(image, poly, fill)
+            if stroke is not None:
+                self.stroke(image, poly, width, stroke)
+        for x, y, size, content, rgba in texts(n):
+            self.text(image, x, y, size, content, rgba)
+        write_png(path, (np.clip(image, 0, 1) * 255).astype(np.uint8))
+
+def write_png(path, image):
+    """Writes an (h, w, 3) uint8 array as an RGB PNG."""
+    height, width = image.shape[:2]
+    raw = b"".join(b"\x00" + row.tobytes() for row in image)
+    def chunk(tag, body):
+        return (struct.pack(">I", len(body)) + tag + body
+                + struct.pack(">I", zlib.crc32(tag + body) & 0xffffffff))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+BACKENDS = {
+    "svg": SVGBackend,
+    "png": PNGBackend,
+}
+
+def render_frames(backend, start, end, output, step=1):
+    import bpy
+    os.makedirs(output, exist_ok=True)
+    paths = []
+    for n in range(start, end + 1, step):
+        # Runs frame change handlers, like the windowed code view's
+        bpy.context.scene.frame_set(n)
+        path = os.path.join(output, f"frame_{n:06d}.{backend.extension}")
+        backend.write(n, path)
+        paths.append(path)
+    return paths
+
+"""
+Headless runs
+"""
+
+def run_headless(script):
+    """Runs script as __main__ against the bpy stand-in."""
+    sys.path[:0] = [
+        os.path.join(ROOT, "headless"), ROOT,
+        os.path.dirname(os.path.abspath(script)),
+    ]
+    import bpy
+    bpy.reset()
+    pencil = bpy.data.grease_pencils.new("Stroke")
+    pencil.layers.new("Lines")
+    bpy.context.scene.collection.objects.link(bpy.data.objects.new("Stroke", pencil))
+    runpy.run_path(script, run_name="__main__")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("script")
+    parser.add_argument("-f", "--format", choices=BACKENDS, default="svg")
+    parser.add_argument("-o", "--output", default="preview")
+    parser.add_argument("-s", "--start", type=int, default=1)
+    parser.add_argument("-e", "--end", type=int, default=None, help="default: last keyframe")
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=None, help="output size relative to 1920x1080")
+    args = parser.parse_args()
+
+    run_headless(args.script)
+    backend = BACKENDS[args.format]() if args.scale is None else BACKENDS[args.format](args.scale)
+    end = args.end if args.end is not None else last_frame()
+    paths = render_frames(backend, args.start, end, args.output, args.step)
+    print(f"Wrote {len(paths)} frames to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Renders an animation script's frames in parallel with background Blender
+workers.
+
+    python render.py animations/sorting/sorting.py scene.blend 1 2400 -o out
+
+The frame range is split into chunks; each chunk runs the script in its own
+`blender -b` process and renders into out/chunks/<start>-<end>, and
+finished chunks are merged into out/ as frame_NNNNNN.<ext>. A chunk is
+marked done only once all of its frames exist, so re-running the same
+command resumes by rendering just the chunks that failed or never ran.
+
+Every worker runs the script with the same RENDER_SEED in its environment,
+so scripts that honour it (like the sorting animation) generate the same
+animation in each chunk. The seed is kept in out/seed so resumed renders
+reuse it.
+
+The worker command is a template; {blender}, {blend}, {script}, {start},
+{end}, {output} (a path prefix ending in ######) and {threads} are
+substituted, so a stub renderer can stand in for Blender.
+"""
+
+import argparse
+import os
+import random
+import shlex
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_COMMAND = (
+    "{blender} -b {blend} --python {script} "
+    "-o {output} -t {threads} -s {start} -e {end} -a"
+)
+DONE = ".done"
+SEED_FILE = "seed"
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def chunks(start, end, size):
+    """Splits start..end (inclusive) into (start, end) ranges of size frames."""
+    return [(s, min(s + size - 1, end)) for s in range(start, end + 1, size)]
+
+def chunk_dir(output, start, end):
+    return os.path.join(output, "chunks", f"{start:06d}-{end:06d}")
+
+def chunk_frames(directory):
+    """Frame number -> file name for frames rendered into directory."""
+    frames = {}
+    for name in os.listdir(directory):
+        stem = os.path.splitext(name)[0]
+        digits = stem[len(stem.rstrip("0123456789")):]
+        if digits and not name.startswith("."):
+            frames[int(digits)] = name
+    return frames
+
+def is_done(directory):
+    return os.path.exists(os.path.join(directory, DONE))
+
+def render_chunk(args, start, end):
+    """Runs one worker. Returns (start, end, error or None)."""
+    directory = chunk_dir(args.output, start, end)
+    os.makedirs(directory, exist_ok=True)
+    command = [
+        token.format(
+            blender=args.blender, blend=args.blend, script=args.script,
+            start=start, end=end, threads=args.threads,
+            output=os.path.join(directory, "frame_######"),
+        )
+        for token in shlex.split(args.command)
+    ]
+    # Let the script import util, gputil and modules next to it
+    env = dict(os.environ)
+    env["RENDER_SEED"] = str(args.seed)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (
+        ROOT, os.path.dirname(os.path.abspath(args.script)), env.get("PYTHONPATH")
+    )))
+    with open(os.path.join(directory, "worker.log"), "w") as log:
+        process = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, env=env)
+    if process.returncode != 0:
+        return start, end, f"exit code {process.returncode}"
+    missing = set(range(start, end + 1)) - set(chunk_frames(directory))
+    if missing:
+        return start, end, f"{len(missing)} frames missing"
+    open(os.path.join(directory, DONE), "w").close()
+    return start, end, None
+
+def merge(args, ranges):
+    """Moves rendered frames of finished chunks into the output directory."""
+    merged = 0
+    for start, end in ranges:
+        directory = chunk_dir(args.output, start, end)
+        if not is_done(directory):
+            continue
+        for frame, name in chunk_frames(directory).items():
+            ext = os.path.splitext(name)[1]
+            os.replace(
+                os.path.join(directory, name),
+                os.path.join(args.output, f"frame_{frame:06d}{ext}")
+            )
+            merged += 1
+    return merged
+
+def render_seed(args):
+    """The seed given, else the one of an earlier run into output, else a new one."""
+    path = os.path.join(args.output, SEED_FILE)
+    if args.seed is None and os.path.exists(path):
+        with open(path) as f:
+            return int(f.read())
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 31)
+    os.makedirs(args.output, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{seed}\n")
+    return seed
+
+def render(args):
+    args.seed = render_seed(args)
+    ranges = chunks(args.start, args.end, args.chunk_size)
+    pending = [r for r in ranges if not is_done(chunk_dir(args.output, *r))]
+    print(f"{len(ranges)} chunks, {len(ranges) - len(pending)} already done, "
+          f"{args.workers} workers")
+    failed = []
+    for attempt in range(args.retries + 1):
+        if not pending:
+            break
+        failed = []
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(render_chunk, args, *r) for r in pending]
+            for future in as_completed(futures):
+                start, end, error = future.result()
+                if error is None:
+                    print(f"frames {start}-{end} done")
+                else:
+                    print(f"frames {start}-{end} failed: {error}")
+                    failed.append((start, end))
+        pending = failed
+    merged = merge(args, ranges)
+    print(f"merged {merged} frames into {args.output}")
+    if failed:
+        print(f"{len(failed)} chunks failed; re-run to resume")
+    return not failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("script", help="animation script to run in each worker")
+    parser.add_argument("blend", help=".blend file to render")
+    parser.add_argument("start", type=int, help="first frame")
+    parser.add_argument("end", type=int, help="last frame")
+    parser.add_argument("-o", "--output", default="render")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("-c", "--chunk-size", type=int, default=50)
+    parser.add_argument("-t", "--threads", type=int, default=None,
+        help="render threads per worker (default: cores / workers)")
+    parser.add_argument("-r", "--retries", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None,
+        help="RENDER_SEED passed to every worker (default: reuse or pick one)")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"))
+    parser.add_argument("--command", default=DEFAULT_COMMAND,
+        help="worker command template")
+    args = parser.parse_args(argv)
+    if args.threads is None:
+        args.threads = max(1, (os.cpu_count() or 1) // args.workers)
+    args.output = os.path.abspath(args.output)
+    return 0 if render(args) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Tests run against the headless bpy stand-in (headless/bpy.py):
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path[:0] = [
+    os.path.join(ROOT, "headless"),
+    ROOT,
+    os.path.join(ROOT, "animations", "sorting"),
+]
+
+import bpy
+
+# Modules holding per-run state, imported afresh by every test
+MODULES = ("util", "gputil", "sorttrace", "sorting")
+
+@pytest.fixture
+def scene(tmp_path, monkeypatch):
+    """A fresh scene with the "Stroke" pencil and "Lines" layer the scripts expect."""
+    bpy.reset()
+    for name in MODULES:
+        sys.modules.pop(name, None)
+    monkeypatch.setenv("GPUTIL_GEOMETRY_CACHE", str(tmp_path / "geometry"))
+    pencil = bpy.data.grease_pencils.new("Stroke")
+    pencil.layers.new("Lines")
+    bpy.context.scene.collection.objects.link(bpy.data.objects.new("Stroke", pencil))
+    return bpy.context.scene
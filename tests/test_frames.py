@@ -0,0 +1,21 @@
+import bpy
+
+def lines():
+    return bpy.data.grease_pencils["Stroke"].layers["Lines"]
+
+def test_ensure_frames_resyncs_after_outside_clear(scene):
+    import gputil
+    layer = lines()
+    first = gputil.get_frame(layer, 1)
+    layer.frames.clear()
+    frames = gputil.ensure_frames(layer, 1, 2)
+    assert frames[0] is not first
+    assert list(layer.frames) == frames
+
+def test_get_frame_picks_up_outside_frames(scene):
+    import gputil
+    layer = lines()
+    gputil.get_frame(layer, 1)
+    outside = layer.frames.new(2)
+    assert gputil.get_frame(layer, 2) is outside
+    assert gputil.get_frame(layer, 1) is not None
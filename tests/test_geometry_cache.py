@@ -0,0 +1,35 @@
+import os
+
+import bpy
+
+def draw(gputil, layer):
+    frame = gputil.get_frame(layer, 3)
+    gputil.draw_rect(frame, origin=(10, 20), width=30, height=40)
+
+def contents(layer):
+    return [
+        (frame.frame_number, [(stroke.material_index, [tuple(p.co) for p in stroke.points])
+                              for stroke in frame.strokes])
+        for frame in layer.frames
+    ]
+
+def test_round_trip(scene):
+    import gputil
+    layer = bpy.data.grease_pencils["Stroke"].layers["Lines"]
+    assert not gputil.cached_geometry("test", {"a": 1}, [layer], lambda: draw(gputil, layer))
+    drawn = contents(layer)
+    assert gputil.cached_geometry("test", {"a": 1}, [layer], lambda: draw(gputil, layer))
+    assert contents(layer) == drawn
+    assert os.listdir(gputil.GEOMETRY_CACHE) == [os.path.basename(gputil.geometry_cache_path("test", {"a": 1}))]
+
+def test_corrupt_file_is_a_miss(scene):
+    import gputil
+    layer = bpy.data.grease_pencils["Stroke"].layers["Lines"]
+    path = gputil.geometry_cache_path("test", {"a": 1})
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"PK\x03\x04 half written")
+    calls = []
+    assert not gputil.cached_geometry("test", {"a": 1}, [layer], lambda: calls.append(draw(gputil, layer)))
+    assert calls
+    assert gputil.cached_geometry("test", {"a": 1}, [layer], lambda: draw(gputil, layer))
@@ -0,0 +1,17 @@
+import bpy
+
+def test_id_names_stay_indexed(scene):
+    a = bpy.data.objects.new("Box", None)
+    b = bpy.data.objects.new("Box", None)
+    assert (a.name, b.name) == ("Box", "Box.001")
+    b.name = "Other"
+    assert bpy.data.objects["Other"] is b
+    assert bpy.data.objects.new("Box", None).name == "Box.001"
+    a.name = "Other"
+    assert a.name == "Other.001"
+    bpy.data.objects.remove(b)
+    assert bpy.data.objects.get("Other") is None
+    assert bpy.data.objects.find("Other.001") == list(bpy.data.objects).index(a)
+    assert bpy.data.objects.new("Other", None).name == "Other"
+    dup = a.copy()
+    assert bpy.data.objects[dup.name] is dup and dup.name != a.name
@@ -0,0 +1,30 @@
+import bpy
+
+def keys(fcurve):
+    return [(tuple(p.co), p.interpolation) for p in fcurve.keyframe_points]
+
+def test_bulk_keys_merge_into_existing_curve(scene):
+    import util
+    obj = bpy.data.objects.new("A", None)
+    fcurve = util.get_fcurve(obj, "location", 0)
+    util.write_keyframes(fcurve, {1.0: 0.0, 10.0: 1.0})
+    fcurve.keyframe_points[1].interpolation = "CONSTANT"
+    with util.bulk_keyframes():
+        util.keyframe(obj, "location", 5, 0.5, index=0)
+        util.keyframe(obj, "location", 10, 2.0, index=0)
+    assert keys(fcurve) == [
+        ((1.0, 0.0), "BEZIER"),
+        ((5.0, 0.5), "BEZIER"),
+        ((10.0, 2.0), "CONSTANT"),
+    ]
+
+def test_bulk_keys_match_keyframe_insert(scene):
+    import util
+    inserted = bpy.data.objects.new("Inserted", None)
+    bulk = bpy.data.objects.new("Bulk", None)
+    util.pop_in(inserted, frame=10)
+    with util.bulk_keyframes():
+        util.pop_in(bulk, frame=10)
+    for fcurve in inserted.animation_data.action.fcurves:
+        other = bulk.animation_data.action.fcurves.find(fcurve.data_path, index=fcurve.array_index)
+        assert [tuple(p.co) for p in other.keyframe_points] == [tuple(p.co) for p in fcurve.keyframe_points]
@@ -0,0 +1,62 @@
+import os
+import shlex
+import sys
+
+import render
+
+STUB = os.path.join(render.ROOT, "headless", "stub_render.py")
+
+def run(tmp_path, *options, seed=None, chunk_size=4):
+    command = " ".join(
+        [shlex.quote(sys.executable), shlex.quote(STUB), "{output} {start} {end}"]
+        + [shlex.quote(str(option)) for option in options]
+    )
+    argv = [
+        "script.py", "scene.blend", "1", "10", "-o", str(tmp_path / "out"),
+        "-w", "2", "-c", str(chunk_size), "-r", "0", "--command", command,
+    ]
+    if seed is not None:
+        argv += ["--seed", str(seed)]
+    return render.main(argv)
+
+def frames(tmp_path):
+    out = tmp_path / "out"
+    return sorted(int(p.stem[len("frame_"):]) for p in out.glob("frame_*.png"))
+
+def test_chunks():
+    assert render.chunks(1, 10, 4) == [(1, 4), (5, 8), (9, 10)]
+    assert render.chunks(3, 3, 50) == [(3, 3)]
+    assert render.chunks(1, 8, 4) == [(1, 4), (5, 8)]
+
+def test_render_and_merge(tmp_path):
+    assert run(tmp_path, seed=7) == 0
+    assert frames(tmp_path) == list(range(1, 11))
+    out = tmp_path / "out"
+    assert {(out / f"frame_{n:06d}.png").read_text() for n in range(1, 11)} == {"7"}
+    for start, end in render.chunks(1, 10, 4):
+        directory = render.chunk_dir(str(out), start, end)
+        assert render.is_done(directory)
+        assert render.chunk_frames(directory) == {}
+
+def test_missing_frame_fails_chunk(tmp_path):
+    assert run(tmp_path, "--skip", 6) == 1
+    assert frames(tmp_path) == [1, 2, 3, 4, 9, 10]
+    directory = render.chunk_dir(str(tmp_path / "out"), 5, 8)
+    assert not render.is_done(directory)
+    assert sorted(render.chunk_frames(directory)) == [5, 7, 8]
+
+def test_resume_after_failed_chunk(tmp_path):
+    log = tmp_path / "log"
+    options = ("--fail-once", tmp_path / "failed", "--log", log)
+    assert run(tmp_path, *options, seed=7) == 1
+    runs = log.read_text().splitlines()
+    assert len(runs) == 3
+    assert len(frames(tmp_path)) < 10
+    # Resuming, without --seed, reruns only the chunk that failed
+    log.write_text("")
+    assert run(tmp_path, *options) == 0
+    assert len(log.read_text().splitlines()) == 1
+    assert log.read_text().splitlines()[0] in runs
+    assert frames(tmp_path) == list(range(1, 11))
+    out = tmp_path / "out"
+    assert {(out / f"frame_{n:06d}.png").read_text() for n in range(1, 11)} == {"7"}
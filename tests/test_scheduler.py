@@ -0,0 +1,63 @@
+import bpy
+import pytest
+
+def counting(n, log=None):
+    for i in range(1, n + 1):
+        if log is not None:
+            log.append(i)
+        yield i
+    return "done"
+
+def test_progress_and_result(scene):
+    import util
+    finished = []
+    job = util.run_steps(counting(4), total=4, budget=0, on_done=finished.append,
+        timers=bpy.app.timers)
+    assert job.state == "running" and util.jobs() == [job]
+    assert job.progress == 0
+    bpy.app.timers.run(limit=2)
+    assert job.progress == 0.5
+    bpy.app.timers.run()
+    assert (job.state, job.progress, job.result) == ("finished", 1.0, "done")
+    assert finished == [job] and util.jobs() == []
+
+def test_budget_slices_ticks(scene):
+    import util
+    sliced = util.run_steps(counting(5), budget=0, timers=bpy.app.timers)
+    bpy.app.timers.run()
+    # One step per tick, plus the tick that finds the generator exhausted
+    assert sliced.ticks == 6
+    whole = util.run_steps(counting(5), budget=60, timers=bpy.app.timers)
+    bpy.app.timers.run()
+    assert whole.ticks == 1 and whole.state == "finished"
+
+def test_background_runs_blocking(scene):
+    import util
+    job = util.run_steps(counting(3))
+    assert (job.state, job.ticks, job.result) == ("finished", 0, "done")
+
+def test_cancel(scene):
+    import util
+    log = []
+    steps = counting(10, log)
+    finished = []
+    job = util.run_steps(steps, budget=0, on_done=finished.append, timers=bpy.app.timers)
+    bpy.app.timers.run(limit=3)
+    job.cancel()
+    assert job.state == "cancelled" and finished == [job] and util.jobs() == []
+    # The generator is closed and the timer drops out on its next tick
+    assert next(steps, None) is None
+    assert bpy.app.timers.run() == 1
+    assert log == [1, 2, 3]
+
+def test_exception_fails_job(scene):
+    import util
+    def failing():
+        yield 1
+        raise ValueError("broken")
+    finished = []
+    job = util.run_steps(failing(), on_done=finished.append, timers=bpy.app.timers)
+    with pytest.raises(ValueError):
+        bpy.app.timers.run()
+    assert job.state == "failed" and isinstance(job.error, ValueError)
+    assert finished == [job] and util.jobs() == []
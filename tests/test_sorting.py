@@ -0,0 +1,16 @@
+import types
+
+def frame_numbers(layer):
+    return [frame.frame_number for frame in layer.frames]
+
+def test_held_frames_drop_old_keyframes(scene):
+    import gputil
+    import sorting
+    # The same bars three times: frames 2 and 3 hold frame 1
+    bars = ([2, 1, 3], {0}, set(), None)
+    trace = types.SimpleNamespace(values=[1, 2, 3], replay=lambda: iter([bars] * 3))
+    # Keyframes left by an earlier run, as when a script is rerun
+    for n in range(1, 4):
+        gputil.get_frame(sorting.layer, n)
+    sorting.render_trace(trace)
+    assert frame_numbers(sorting.layer) == [1]
@@ -0,0 +1,122 @@
+import random
+
+import pytest
+
+import sorttrace
+
+# The algorithms as they drew inline before traces, calling draw_bars
+# directly; replaying a trace has to produce the same calls
+
+def old_selection_sort(numbers, draw_bars):
+    draw_bars(numbers)
+    length = len(numbers)
+    done = set()
+    for i in range(length):
+        min_index = i
+        for j in range(i, length):
+            draw_bars(numbers, highlight={j}, done=done, pointer=min_index)
+            if numbers[j] < numbers[min_index]:
+                min_index = j
+        numbers[min_index], numbers[i] = numbers[i], numbers[min_index]
+        done.add(i)
+        draw_bars(numbers, done=done)
+
+def old_bubble_sort(numbers, draw_bars):
+    draw_bars(numbers)
+    length = len(numbers)
+    done = set()
+    for i in range(length):
+        for j in range(length - i - 1):
+            draw_bars(numbers, highlight={j, j + 1}, done=done)
+            if numbers[j] > numbers[j + 1]:
+                numbers[j], numbers[j + 1] = numbers[j + 1], numbers[j]
+        done.add(length - i - 1)
+    draw_bars(numbers, done=done)
+
+def old_insertion_sort(numbers, draw_bars):
+    draw_bars(numbers)
+    length = len(numbers)
+    done = set()
+    for i in range(length):
+        draw_bars(numbers, highlight={i}, done=done)
+        done.add(i)
+        for j in range(i - 1, -1, -1):
+            if numbers[j + 1] < numbers[j]:
+                numbers[j], numbers[j + 1] = numbers[j + 1], numbers[j]
+                draw_bars(numbers, highlight={j}, done=done - {j})
+            else:
+                draw_bars(numbers, highlight={j}, done=done - {j})
+                break
+        draw_bars(numbers, done=done)
+    draw_bars(numbers, done=done)
+
+def old_mergesort(numbers, draw_bars):
+    done = set()
+    length = len(numbers)
+    draw_bars(numbers)
+    def mergesort_aux(numbers, start, end):
+        if end - start <= 1:
+            return
+        midpoint = int(start + ((end - start) / 2))
+        mergesort_aux(numbers, start, midpoint)
+        mergesort_aux(numbers, midpoint, end)
+        left = numbers[start:midpoint]
+        right = numbers[midpoint:end]
+        i = start
+        while left or right:
+            if not right:
+                numbers[i] = left[0]
+                left = left[1:]
+            elif not left:
+                numbers[i] = right[0]
+                right = right[1:]
+            elif left[0] <= right[0]:
+                numbers[i] = left[0]
+                left = left[1:]
+            else:
+                numbers[i] = right[0]
+                right = right[1:]
+            if start == 0 and end == length:
+                done.add(i)
+            draw_bars(numbers, highlight={i}, done=done - {i})
+            i += 1
+    mergesort_aux(numbers, 0, len(numbers))
+    draw_bars(numbers, done=done)
+
+OLD = {
+    "selection": old_selection_sort,
+    "bubble": old_bubble_sort,
+    "insertion": old_insertion_sort,
+    "merge": old_mergesort,
+}
+
+def values(n):
+    rng = random.Random(n)
+    return [rng.randint(1, 10) for _ in range(n)]
+
+@pytest.mark.parametrize("name", sorted(OLD))
+@pytest.mark.parametrize("n", [1, 2, 7, 30])
+def test_replay_matches_inline_drawing(name, n):
+    calls = []
+    def draw_bars(bars, highlight=None, done=None, pointer=None):
+        highlight = set(highlight or ())
+        calls.append((list(bars), highlight, set(done or ()) - highlight, pointer))
+    OLD[name](values(n), draw_bars)
+    trace = sorttrace.ALGORITHMS[name](values(n))
+    replayed = [
+        (list(bars), set(highlight), set(done), pointer)
+        for bars, highlight, done, pointer in trace.replay()
+    ]
+    assert replayed == calls
+    assert trace.frame_count() == len(calls)
+    assert trace.result() == sorted(values(n))
+
+@pytest.mark.parametrize("name", sorted(OLD))
+@pytest.mark.parametrize("frames", [1, 5, 40, 10000])
+def test_sampled_trace_result(name, frames):
+    trace = sorttrace.sample_trace(name, values(30), frames)
+    assert isinstance(trace, sorttrace.SampledTrace)
+    assert trace.result() == sorted(values(30))
+    replayed = [list(bars) for bars, _, _, _ in trace.replay()]
+    assert replayed[-1] == sorted(values(30))
+    assert len(replayed) <= frames + 1
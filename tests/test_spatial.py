@@ -0,0 +1,36 @@
+import bpy
+
+# Objects are placed around y = 100, away from the "Stroke" object at the origin
+
+def add(scene, name, location):
+    obj = bpy.data.objects.new(name, None)
+    obj.location = list(location)
+    scene.collection.objects.link(obj)
+    return obj
+
+def test_queries(scene):
+    import util
+    for i in range(5):
+        add(scene, f"O{i}", (i + 1, 100, 0))
+    index = util.spatial_index()
+    assert [obj.name for obj, _ in index.nearest((0, 100, 0), 2)] == ["O0", "O1"]
+    assert [obj.name for obj in util.within((3, 100, 0), 1)] == ["O2", "O1", "O3"]
+    assert [obj.name for obj in util.in_box((0.5, 50, None), (2.5, None, None))] == ["O0", "O1"]
+
+def test_replaced_object_rebuilds(scene):
+    import util
+    for i in range(5):
+        add(scene, f"O{i}", (i + 1, 100, 0))
+    util.nearest((0, 100, 0), 2)
+    bpy.data.objects.remove(bpy.data.objects["O0"])
+    add(scene, "New", (0.5, 100, 0))
+    assert [obj.name for obj in util.nearest((0, 100, 0), 2)] == ["New", "O1"]
+
+def test_held_until_rebuild(scene):
+    import util
+    obj = add(scene, "A", (1, 0, 0))
+    index = util.spatial_index()
+    assert util.spatial_index() is index
+    obj.location = [10, 0, 0]
+    assert util.spatial_index() is index
+    assert util.spatial_index(rebuild=True) is not index
@@ -0,0 +1,36 @@
+import bpy
+
+def test_shared_text_material(scene):
+    import gputil
+    import preview
+    assert bpy.app.version < (2, 92, 0)
+    a = gputil.add_text("A", "first", show_at=5, shared=True)
+    b = gputil.add_text("B", "second", shared=True)
+    gputil.hide_text_at(b, 10)
+    assert a.data.materials[0] is b.data.materials[0]
+    assert len(bpy.data.materials) == 1
+    shown = lambda n: sorted(body for _, _, _, body, _ in preview.texts(n))
+    assert shown(1) == ["second"]
+    assert shown(5) == ["first", "second"]
+    assert shown(10) == ["first"]
+
+def test_png_draws_text_boxes(scene):
+    import numpy as np
+    import gputil
+    import preview
+    gputil.add_text("A", "  code", origin=(400, 500), size=40, show_at=5)
+    backend = preview.PNGBackend(scale=1.0)
+    def drawn(n):
+        image = np.ones((backend.height, backend.width, 3))
+        for text in preview.texts(n):
+            backend.text(image, *text)
+        rows, cols = np.nonzero(image.min(axis=2) < 1)
+        return rows, cols
+    assert len(drawn(1)[0]) == 0
+    (x, y, size, _, _), = preview.texts(5)
+    rows, cols = drawn(5)
+    # Four characters boxed after two of indent
+    width = preview.TEXT_WIDTH * size
+    assert abs(cols.min() - (x + 2 * width)) <= 1
+    assert abs(cols.max() - (x + 6 * width)) <= 1
+    assert abs(rows.max() - (preview.HEIGHT - y)) <= 1
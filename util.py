@@ -1,20 +1,412 @@
 import bpy
 import math
+import os
+import tempfile
+import time
+import numpy as np
+from contextlib import contextmanager
+import instrument
+
+try:
+    from mathutils import kdtree
+except ImportError:
+    kdtree = None
+
+"""
+Keyframes
+"""
+
+class KeyframeWriter():
+    """
+    Collects keyframes and writes each F-curve once, using
+    keyframe_points.add and foreach_set instead of keyframe_insert.
+    """
+    def __init__(self):
+        # (id_data, data_path, index) -> {frame: value}
+        self.curves = {}
+
+    def add(self, struct, prop, index, frame, value):
+        """Queues a key for struct.prop[index] (index -1 for scalars)."""
+        key = (struct.id_data, data_path(struct, prop), max(index, 0))
+        self.curves.setdefault(key, {})[float(frame)] = float(value)
+
+    def __len__(self):
+        return sum(len(keys) for keys in self.curves.values())
+
+    def flush(self):
+        for (id_data, data_path, index), keys in self.curves.items():
+            fcurve = get_fcurve(id_data, data_path, index)
+            write_keyframes(fcurve, keys)
+        self.curves = {}
+
+_keyframe_writer = None
+
+@contextmanager
+def bulk_keyframes():
+    """Routes keyframes made by the helpers in this module through one writer."""
+    global _keyframe_writer
+    if _keyframe_writer is not None:
+        yield _keyframe_writer
+        return
+    _keyframe_writer = KeyframeWriter()
+    try:
+        yield _keyframe_writer
+        _keyframe_writer.flush()
+    finally:
+        _keyframe_writer = None
+
+def data_path(struct, prop):
+    """Path of struct.prop from its ID; prop may be a custom property like '["name"]'."""
+    if prop.startswith("["):
+        return struct.path_from_id() + prop
+    return struct.path_from_id(prop)
+
+def keyframe(struct, prop, frame, value, index=-1):
+    """
+    Keys struct.prop to value at frame. Sequence values key every component.
+    Inside bulk_keyframes() the key is queued instead of inserted.
+    """
+    if _keyframe_writer is not None:
+        if isinstance(value, (tuple, list)):
+            for i, v in enumerate(value):
+                _keyframe_writer.add(struct, prop, i, frame, v)
+        else:
+            _keyframe_writer.add(struct, prop, index, frame, value)
+        return
+    if prop.startswith("["):
+        struct[prop[2:-2]] = value
+    elif index >= 0:
+        getattr(struct, prop)[index] = value
+    else:
+        setattr(struct, prop, value)
+    struct.keyframe_insert(prop, index=index, frame=frame)
+
+def get_fcurve(id_data, data_path, index=0):
+    anim = id_data.animation_data
+    if anim is None:
+        anim = id_data.animation_data_create()
+    if anim.action is None:
+        anim.action = bpy.data.actions.new(f"{id_data.name}Action")
+    fcurve = anim.action.fcurves.find(data_path, index=index)
+    if fcurve is None:
+        fcurve = anim.action.fcurves.new(data_path, index=index)
+    return fcurve
+
+def write_keyframes(fcurve, keys, interpolation=None):
+    """
+    Merges {frame: value} into fcurve with a single add and foreach_set.
+    Existing keys keep their place and attributes; new frames are appended
+    and fcurve.update() sorts them in. If interpolation is given, every key
+    of the curve is set to it.
+    """
+    points = fcurve.keyframe_points
+    existing = len(points)
+    co = [0.0] * (existing * 2)
+    if existing:
+        points.foreach_get("co", co)
+    index = {frame: i for i, frame in enumerate(co[0::2])}
+    added = []
+    for frame, value in keys.items():
+        i = index.get(frame)
+        if i is None:
+            added.extend((frame, value))
+        else:
+            co[i * 2 + 1] = value
+    if added:
+        points.add(len(added) // 2)
+        co.extend(added)
+    points.foreach_set("co", co)
+    if interpolation is not None:
+        for point in points:
+            point.interpolation = interpolation
+    fcurve.update()
+
+def prune_keyframes(fcurve):
+    """Removes keys that don't change the value of fcurve. Returns how many were removed."""
+    points = fcurve.keyframe_points
+    co = [0.0] * (len(points) * 2)
+    points.foreach_get("co", co)
+    values = co[1::2]
+    redundant = []
+    for i in range(1, len(values)):
+        if values[i] != values[i - 1]:
+            continue
+        # A repeated value is redundant if the curve holds it anyway: both
+        # neighbouring segments are constant, the next key has the same
+        # value too, or there is no next key
+        held = (points[i - 1].interpolation == "CONSTANT"
+                and points[i].interpolation == "CONSTANT")
+        if held or i == len(values) - 1 or values[i + 1] == values[i]:
+            redundant.append(i)
+    for i in reversed(redundant):
+        points.remove(points[i], fast=True)
+    if redundant:
+        fcurve.update()
+    return len(redundant)
+
+"""
+Batching
+"""
+
+class Batch():
+    """
+    Mutations deferred by batch(). Operations run on exit grouped by phase,
+    and an operation queued again under the same key replaces the earlier
+    one.
+    """
+    # Flush phases, in order: create data, write properties
+    CREATE = 0
+    WRITE = 1
+
+    def __init__(self):
+        self.ops = ({}, {})
+        self.queues = {}
+        self.needs_update = False
+
+    def defer(self, phase, fn, *args, key=None):
+        ops = self.ops[phase]
+        if key is None:
+            key = len(ops)
+        ops[key] = (fn, args)
+
+    def queue(self, name, flush):
+        """List named name, passed to flush(list) in the CREATE phase."""
+        items = self.queues.get(name)
+        if items is None:
+            items = self.queues[name] = []
+            self.defer(Batch.CREATE, flush, items, key=name)
+        return items
+
+    def flush(self):
+        for ops in self.ops:
+            for fn, args in ops.values():
+                fn(*args)
+        self.ops = ({}, {})
+        self.queues = {}
+
+_batch = None
+
+@contextmanager
+def batch():
+    """
+    Defers keyframes, visibility changes, stroke creation, material writes
+    and view layer updates made by util and gputil until the block exits,
+    then writes them in bulk: data first, then properties, then visibility
+    and keyframes, then a single view layer update if one was requested.
+    """
+    global _batch
+    if _batch is not None:
+        yield _batch
+        return
+    _batch = Batch()
+    try:
+        with bulk_keyframes(), visibility_timeline():
+            yield _batch
+            _batch.flush()
+        if _batch.needs_update:
+            bpy.context.view_layer.update()
+    finally:
+        _batch = None
+
+def current_batch():
+    return _batch
+
+def update():
+    """Updates the view layer, or once at the end of the current batch."""
+    if _batch is not None:
+        _batch.needs_update = True
+    else:
+        bpy.context.view_layer.update()
+
+"""
+Scheduling
+"""
+
+BUDGET = 0.05 # seconds of work per timer tick
+
+class Job():
+    """
+    A generator run in time slices from bpy.app.timers so that Blender's UI
+    stays responsive. Each tick advances the generator until budget seconds
+    have passed; numbers it yields are read as progress out of total.
+    """
+    def __init__(self, steps, total=None, budget=BUDGET, on_done=None):
+        self.steps = iter(steps)
+        self.total = total
+        self.budget = budget
+        self.on_done = on_done
+        self.state = "pending" # running, finished, cancelled or failed
+        self.done = 0
+        self.ticks = 0
+        self.elapsed = 0.0
+        self.result = None
+        self.error = None
+
+    @property
+    def progress(self):
+        """Fraction done, or None if there is no total."""
+        if self.state == "finished":
+            return 1.0
+        if not self.total:
+            return None
+        return min(self.done / self.total, 1.0)
+
+    def step(self):
+        """Advances the generator once. Returns False when it is exhausted."""
+        try:
+            value = next(self.steps)
+        except StopIteration as stop:
+            self.result = stop.value
+            self.finish("finished")
+            return False
+        except Exception as e:
+            self.error = e
+            self.finish("failed")
+            raise
+        if isinstance(value, (int, float)):
+            self.done = value
+        return True
+
+    def tick(self):
+        """Timer callback: the delay until the next tick, or None when done."""
+        if self.state != "running":
+            return None
+        self.ticks += 1
+        start = time.perf_counter()
+        try:
+            while self.step():
+                if time.perf_counter() - start >= self.budget:
+                    return 0.0
+        finally:
+            self.elapsed += time.perf_counter() - start
+        return None
+
+    def start(self, timers=None):
+        """Runs the job from timers (bpy.app.timers by default)."""
+        self.state = "running"
+        _jobs.append(self)
+        (timers or bpy.app.timers).register(self.tick, first_interval=0.0)
+        return self
+
+    def run(self):
+        """Runs the job to completion without yielding to the UI."""
+        self.state = "running"
+        start = time.perf_counter()
+        try:
+            while self.step():
+                pass
+        finally:
+            self.elapsed += time.perf_counter() - start
+        return self.result
+
+    def cancel(self):
+        """Stops the job; its timer unregisters itself on the next tick."""
+        if self.state in ("pending", "running"):
+            if hasattr(self.steps, "close"):
+                self.steps.close()
+            self.finish("cancelled")
+
+    def finish(self, state):
+        self.state = state
+        if self in _jobs:
+            _jobs.remove(self)
+        if self.on_done is not None:
+            self.on_done(self)
+
+_jobs = []
+
+def jobs():
+    """Jobs started from timers that haven't finished yet."""
+    return list(_jobs)
+
+def run_steps(steps, total=None, budget=BUDGET, on_done=None, timers=None):
+    """
+    Runs a generator from timers when Blender has a UI, or to completion
+    right away in background mode. Returns the Job.
+    """
+    job = Job(steps, total=total, budget=budget, on_done=on_done)
+    if bpy.app.background and timers is None:
+        job.run()
+        return job
+    return job.start(timers)
+
+"""
+Visibility
+"""
+
+class VisibilityTimeline():
+    """
+    Intended show/hide changes per object, written as the fewest keys: one
+    key before an object's first change and one per actual change, all
+    with CONSTANT interpolation.
+    """
+    def __init__(self):
+        # object -> {frame: shown}
+        self.changes = {}
+
+    def set(self, obj, frame, show, children=True):
+        if isinstance(obj, str):
+            obj = bpy.data.objects.get(obj)
+        self.changes.setdefault(obj, {})[frame] = show
+        if children:
+            for child in obj.children:
+                self.set(child, frame, show, children=children)
+
+    def interval(self, obj, start, end=None, children=True):
+        """Shows obj from start, hiding it again at end if given."""
+        self.set(obj, start, True, children=children)
+        if end is not None:
+            self.set(obj, end, False, children=children)
+
+    def keys(self, changes):
+        """{frame: shown} to the {frame: hidden} keys that express it."""
+        frames = sorted(changes)
+        shown = not changes[frames[0]]
+        keys = {frames[0] - 1: float(not shown)}
+        for frame in frames:
+            if changes[frame] != shown:
+                shown = changes[frame]
+                keys[frame] = float(not shown)
+        return keys
+
+    def write(self):
+        for obj, changes in self.changes.items():
+            keys = self.keys(changes)
+            for prop in ("hide_viewport", "hide_render"):
+                fcurve = get_fcurve(obj, prop)
+                write_keyframes(fcurve, keys, interpolation="CONSTANT")
+                prune_keyframes(fcurve)
+        self.changes = {}
+
+_visibility_timeline = None
+
+@contextmanager
+def visibility_timeline():
+    """Collects show/hide calls made by the helpers in this module and writes them on exit."""
+    global _visibility_timeline
+    if _visibility_timeline is not None:
+        yield _visibility_timeline
+        return
+    _visibility_timeline = VisibilityTimeline()
+    try:
+        yield _visibility_timeline
+        _visibility_timeline.write()
+    finally:
+        _visibility_timeline = None
 
 def toggle_object_visibility(obj, frame, show, children=True):
+    if _visibility_timeline is not None:
+        _visibility_timeline.set(obj, frame, show, children=children)
+        return
     if isinstance(obj, str):
         obj = bpy.data.objects.get(obj)
-    obj.hide_viewport = show
-    obj.hide_render = show
-    obj.keyframe_insert("hide_viewport", frame=frame - 1)
-    obj.keyframe_insert("hide_render", frame=frame - 1)
-    obj.hide_viewport = not show
-    obj.hide_render = not show
-    obj.keyframe_insert("hide_viewport", frame=frame)
-    obj.keyframe_insert("hide_render", frame=frame)
+    keyframe(obj, "hide_viewport", frame - 1, show)
+    keyframe(obj, "hide_render", frame - 1, show)
+    keyframe(obj, "hide_viewport", frame, not show)
+    keyframe(obj, "hide_render", frame, not show)
     if children:
         for child in obj.children:
-            toggle_object_visibility(child, frame, show)
+            toggle_object_visibility(child, frame, show, children=children)
 
 def current_frame():
     return bpy.context.scene.frame_current
@@ -35,18 +427,36 @@ def hide_now(children=True):
     for obj in bpy.context.selected_objects:
         hide_at(obj, frame, children=children)
 
-def create_object_from_template(template_name, name=None, collection=None, scale=None):
+def create_object_from_template(template_name, name=None, collection=None, scale=None, mode="copy"):
+    """
+    Creates an object from a template object and its children.
+
+    mode "copy" gives every object its own copy of the data, "link" shares
+    the template's data and links materials at object level so they can
+    still differ per instance, and "collection" adds a single empty that
+    instances the template (no per-instance materials).
+    """
     template_obj = bpy.data.objects.get(template_name)
-    obj = template_obj.copy()
-    obj.data = template_obj.data.copy()
     coll = resolve_coll(collection)
+    if mode == "collection":
+        obj = bpy.data.objects.new(name or template_name, None)
+        if instrument.ENABLED:
+            instrument.count("objects")
+        obj.instance_type = "COLLECTION"
+        obj.instance_collection = template_collection(template_obj)
+        obj.location = template_obj.location
+        coll.objects.link(obj)
+        if scale is not None:
+            obj.scale = (scale, scale, scale)
+        return obj
+    obj = instance_object(template_obj, mode)
     coll.objects.link(obj)
     if name is not None:
         obj.name = name
-        obj.data.name = obj.name
+        if mode == "copy":
+            obj.data.name = obj.name
     for template_child in template_obj.children:
-        child = template_child.copy()
-        child.data = template_child.data.copy()
+        child = instance_object(template_child, mode)
         child.parent = obj
         child.matrix_parent_inverse = obj.matrix_world.inverted()
         coll.objects.link(child)
@@ -54,6 +464,32 @@ def create_object_from_template(template_name, name=None, collection=None, scale
         obj.scale = (scale, scale, scale)
     return obj
 
+def instance_object(template_obj, mode):
+    obj = template_obj.copy()
+    if instrument.ENABLED:
+        instrument.count("objects")
+    if mode == "copy":
+        obj.data = template_obj.data.copy()
+    elif mode == "link":
+        # Data stays shared; materials move to the object so they can
+        # be changed per instance
+        for slot, template_slot in zip(obj.material_slots, template_obj.material_slots):
+            material = template_slot.material
+            slot.link = "OBJECT"
+            slot.material = material
+    return obj
+
+def template_collection(template_obj):
+    """Collection holding template_obj and its children, for instancing."""
+    name = f"{template_obj.name}_template"
+    coll = bpy.data.collections.get(name)
+    if coll is None:
+        coll = bpy.data.collections.new(name)
+        coll.instance_offset = template_obj.location
+        for obj in [template_obj] + list(template_obj.children):
+            coll.objects.link(obj)
+    return coll
+
 def resolve_obj(obj, graph=None):
     if isinstance(obj, str):
        obj = bpy.data.objects[obj]
@@ -81,18 +517,151 @@ oname = lambda x: x.name
 def oselect(f):
     return sorted(selected(), key=f)
 
+class SpatialIndex():
+    """
+    Index over object locations, read when it is built. Nearest and radius
+    queries use a mathutils KD-tree inside Blender and NumPy distances
+    elsewhere. Results are sorted by distance.
+    """
+    def __init__(self, objs):
+        self.objs = list(objs)
+        self.co = np.array([tuple(obj.location) for obj in self.objs], dtype=float).reshape(-1, 3)
+        self.tree = None
+        if kdtree is not None:
+            self.tree = kdtree.KDTree(len(self.objs))
+            for i, co in enumerate(self.co):
+                self.tree.insert(co, i)
+            self.tree.balance()
+
+    def __len__(self):
+        return len(self.objs)
+
+    def distances(self, co):
+        return np.linalg.norm(self.co - np.asarray(co, dtype=float), axis=1)
+
+    def nearest(self, co, k=1):
+        """Up to k (object, distance) pairs closest to co."""
+        if self.tree is not None:
+            return [(self.objs[i], dist) for _, i, dist in self.tree.find_n(co, k)]
+        dist = self.distances(co)
+        order = np.argsort(dist, kind="stable")[:k]
+        return [(self.objs[i], float(dist[i])) for i in order]
+
+    def within(self, co, radius):
+        """(object, distance) pairs within radius of co."""
+        if self.tree is not None:
+            found = sorted(self.tree.find_range(co, radius), key=lambda item: item[2])
+            return [(self.objs[i], dist) for _, i, dist in found]
+        dist = self.distances(co)
+        order = np.flatnonzero(dist <= radius)
+        order = order[np.argsort(dist[order], kind="stable")]
+        return [(self.objs[i], float(dist[i])) for i in order]
+
+    def box(self, lo, hi):
+        """
+        Objects with lo <= location <= hi on every axis. None bounds leave an
+        axis open, so box((None, 0, None), (None, 10, None)) is a slab in y.
+        """
+        inside = np.ones(len(self.objs), dtype=bool)
+        for axis in range(3):
+            if lo[axis] is not None:
+                inside &= self.co[:, axis] >= lo[axis]
+            if hi[axis] is not None:
+                inside &= self.co[:, axis] <= hi[axis]
+        return [self.objs[i] for i in np.flatnonzero(inside)]
+
+# (object pointer, name) pairs -> SpatialIndex
+_spatial_indexes = {}
+# Set when a depsgraph update touched objects since the indexes were built
+_spatial_dirty = False
+
+def spatial_index(objs=None, rebuild=False):
+    """
+    Cached SpatialIndex over objs (default: the scene's objects).
+
+    Each call checks the cache with one pass over the objects, keyed by
+    their pointers and names, so adding, removing or replacing objects
+    builds a new index. Indexes are also dropped after a depsgraph update
+    touched objects, as edits in the UI do; scripts get no depsgraph
+    updates while running, so pass rebuild=True after moving objects. For
+    many queries, hold on to the returned SpatialIndex and query it
+    directly instead of going through nearest(), within() or in_box().
+    """
+    global _spatial_dirty
+    if objs is None:
+        objs = bpy.context.scene.objects
+    if _spatial_dirty:
+        _spatial_indexes.clear()
+        _spatial_dirty = False
+    objs = list(objs)
+    key = tuple((obj.as_pointer(), obj.name) for obj in objs)
+    index = _spatial_indexes.get(key)
+    if index is None or rebuild:
+        if len(_spatial_indexes) >= 8:
+            _spatial_indexes.clear()
+        index = _spatial_indexes[key] = SpatialIndex(objs)
+    return index
+
+def mark_spatial_dirty(scene, *args):
+    """depsgraph_update_post handler invalidating the cached spatial indexes."""
+    global _spatial_dirty
+    depsgraph = args[0] if args else None
+    if depsgraph is None or depsgraph.id_type_updated("OBJECT"):
+        _spatial_dirty = True
+
+# Replace the handler of an earlier import of this module
+_handlers = bpy.app.handlers.depsgraph_update_post
+for _handler in list(_handlers):
+    if getattr(_handler, "__name__", "") == "mark_spatial_dirty":
+        _handlers.remove(_handler)
+_handlers.append(mark_spatial_dirty)
+
+def nearest(co, k=1, objs=None):
+    """The k objects closest to co."""
+    return [obj for obj, _ in spatial_index(objs).nearest(co, k)]
+
+def within(co, radius, objs=None):
+    """Objects within radius of co, closest first."""
+    return [obj for obj, _ in spatial_index(objs).within(co, radius)]
+
+def in_box(lo, hi, objs=None):
+    """Objects inside the box from lo to hi; see SpatialIndex.box."""
+    return spatial_index(objs).box(lo, hi)
+
+def material_socket(obj, node, output):
+    """Output socket of a node in obj's first material."""
+    material = resolve_object(obj).material_slots[0].material
+    return material.node_tree.nodes[node].outputs[output]
+
 def change_material(obj, node, output, start, end, frame, duration=30):
-    obj = resolve_object(obj)
-    value = obj.material_slots[0].material.node_tree.nodes[node].outputs[output]
-    value.default_value = start
-    value.keyframe_insert("default_value", frame=frame-duration)
-    value.default_value = end
-    value.keyframe_insert("default_value", frame=frame)
+    value = material_socket(obj, node, output)
+    keyframe(value, "default_value", frame - duration, start)
+    keyframe(value, "default_value", frame, end)
+
+def change_material_many(objs, node, output, start, end, frame, duration=30):
+    """
+    change_material for each of objs, with the keyframes written in bulk.
+    Objects sharing a material share its socket, which is looked up once
+    and held only for this call.
+    """
+    sockets = {}
+    with bulk_keyframes():
+        for obj in objs:
+            material = resolve_object(obj).material_slots[0].material
+            key = material.as_pointer()
+            value = sockets.get(key)
+            if value is None:
+                value = sockets[key] = material.node_tree.nodes[node].outputs[output]
+            keyframe(value, "default_value", frame - duration, start)
+            keyframe(value, "default_value", frame, end)
 
 def set_material(obj, node, output, value):
-    obj = resolve_object(obj)
-    node = obj.material_slots[0].material.node_tree.nodes[node].outputs[output]
-    node.default_value = value
+    node = material_socket(obj, node, output)
+    if _batch is not None:
+        _batch.defer(Batch.WRITE, setattr, node, "default_value", value,
+            key=("default_value", node.as_pointer()))
+    else:
+        node.default_value = value
 
 def make_material_copy(obj):
     obj = resolve_object(obj)
@@ -107,10 +676,8 @@ def rigid_activate(obj=None, frame=None):
     if frame is None:
         frame = current_frame()
     obj = resolve_obj(obj)
-    obj.rigid_body.enabled = False
-    obj.rigid_body.keyframe_insert("enabled", frame=frame - 1)
-    obj.rigid_body.enabled = True
-    obj.rigid_body.keyframe_insert("enabled", frame=frame)
+    keyframe(obj.rigid_body, "enabled", frame - 1, False)
+    keyframe(obj.rigid_body, "enabled", frame, True)
 
 def rigid_deactivate(obj=None, frame=None):
     if obj is None:
@@ -118,12 +685,67 @@ def rigid_deactivate(obj=None, frame=None):
     if frame is None:
         frame = current_frame()
     obj = resolve_obj(obj)
-    obj.rigid_body.enabled = True
-    obj.rigid_body.keyframe_insert("enabled", frame=frame - 1)
-    obj.rigid_body.enabled = False
-    obj.rigid_body.keyframe_insert("enabled", frame=frame)
+    keyframe(obj.rigid_body, "enabled", frame - 1, True)
+    keyframe(obj.rigid_body, "enabled", frame, False)
+
+def pop_action(kind, duration, scale=True):
+    """
+    Shared action for pop_in (kind "in") or pop_out ("out") starting at
+    frame 0: visibility keys, and scale keys unless scale is False.
+    Created once per kind and duration and reused by every strip.
+    """
+    name = f"Pop{kind.title()}{duration}" + ("" if scale else "Visibility")
+    action = bpy.data.actions.get(name)
+    if action is not None:
+        return action
+    action = bpy.data.actions.new(name)
+    if kind == "in":
+        sizes, hidden = {0: 0.0, duration: 1.0}, {-1: 1.0, 0: 0.0}
+    else:
+        sizes, hidden = {0: 1.0, duration: 0.0}, {duration - 1: 0.0, duration: 1.0}
+    if scale:
+        for i in range(3):
+            write_keyframes(action.fcurves.new("scale", index=i), sizes)
+    for prop in ("hide_viewport", "hide_render"):
+        write_keyframes(action.fcurves.new(prop), hidden, interpolation="CONSTANT")
+    return action
 
-def pop_in(obj=None, frame=None, duration=15, delay=None):
+def place_action(obj, action, frame, children=None):
+    """
+    Plays action on obj as an NLA strip whose frame 0 lands on frame,
+    sharing the action instead of copying its keys. The strip goes on the
+    first track with room, or a new track. children, if given, is placed
+    the same way on every descendant of obj.
+    """
+    anim = obj.animation_data
+    if anim is None:
+        anim = obj.animation_data_create()
+    start = int(frame + action.frame_range[0])
+    for track in anim.nla_tracks:
+        try:
+            strip = track.strips.new(action.name, start, action)
+            break
+        except RuntimeError:
+            continue
+    else:
+        track = anim.nla_tracks.new()
+        strip = track.strips.new(action.name, start, action)
+    # Only the earliest strip of the first track may hold backwards, or it
+    # would cover the others. Strips are compared by frame, not identity:
+    # each RNA access returns a new wrapper.
+    lowest = track == anim.nla_tracks[0]
+    for i, other in enumerate(sorted(track.strips, key=lambda s: s.frame_start)):
+        other.extrapolation = "HOLD" if lowest and i == 0 else "HOLD_FORWARD"
+    if children is not None:
+        for child in obj.children:
+            place_action(child, children, frame, children)
+    return strip
+
+def pop_in(obj=None, frame=None, duration=15, delay=None, shared=False):
+    """
+    Scales obj up from nothing and shows it at frame. With shared=True the
+    keys come from one action shared by every object through NLA strips.
+    """
     if frame is None:
         frame = current_frame()
     if obj is None or isinstance(obj, list):
@@ -136,20 +758,18 @@ def pop_in(obj=None, frame=None, duration=15, delay=None):
                 f = frame + i * delay
             else:
                 f = frame
-            pop_in(obj, frame=f, duration=duration)
+            pop_in(obj, frame=f, duration=duration, shared=shared)
         return
     obj = resolve_obj(obj)
+    if shared:
+        place_action(obj, pop_action("in", duration), frame,
+            children=pop_action("in", duration, scale=False))
+        return
     show_at(obj, frame)
-    obj.scale[0] = 0
-    obj.scale[1] = 0
-    obj.scale[2] = 0
-    obj.keyframe_insert("scale", frame=frame)
-    obj.scale[0] = 1
-    obj.scale[1] = 1
-    obj.scale[2] = 1
-    obj.keyframe_insert("scale", frame=frame + duration)
-
-def pop_out(obj=None, frame=None, duration=15, delay=None):
+    keyframe(obj, "scale", frame, (0, 0, 0))
+    keyframe(obj, "scale", frame + duration, (1, 1, 1))
+
+def pop_out(obj=None, frame=None, duration=15, delay=None, shared=False):
     if frame is None:
         frame = current_frame()
     if obj is None or isinstance(obj, list):
@@ -162,17 +782,15 @@ def pop_out(obj=None, frame=None, duration=15, delay=None):
                 f = frame + i * delay
             else:
                 f = frame
-            pop_out(obj, frame=f, duration=duration)
+            pop_out(obj, frame=f, duration=duration, shared=shared)
         return
     obj = resolve_obj(obj)
-    obj.scale[0] = 1
-    obj.scale[1] = 1
-    obj.scale[2] = 1
-    obj.keyframe_insert("scale", frame=frame)
-    obj.scale[0] = 0
-    obj.scale[1] = 0
-    obj.scale[2] = 0
-    obj.keyframe_insert("scale", frame=frame + duration)
+    if shared:
+        place_action(obj, pop_action("out", duration), frame,
+            children=pop_action("out", duration, scale=False))
+        return
+    keyframe(obj, "scale", frame, (1, 1, 1))
+    keyframe(obj, "scale", frame + duration, (0, 0, 0))
     hide_at(obj, frame + duration)
 
 def flash_square(obj=None, frame=None, duration=30, hide_duration=30):
@@ -185,11 +803,108 @@ def flash_square(obj=None, frame=None, duration=30, hide_duration=30):
     show_at(obj, frame)
     unit_duration = duration / 4
     for i in range(4):
-        obj.data.shape_keys.key_blocks[f"Edge {i+1}"].value = 1
-        obj.data.shape_keys.key_blocks[f"Edge {i+1}"].keyframe_insert("value", frame=frame)
+        edge = obj.data.shape_keys.key_blocks[f"Edge {i+1}"]
+        keyframe(edge, "value", frame, 1)
         frame = frame + unit_duration
-        obj.data.shape_keys.key_blocks[f"Edge {i+1}"].value = 0
-        obj.data.shape_keys.key_blocks[f"Edge {i+1}"].keyframe_insert("value", frame=round(frame))
+        keyframe(edge, "value", round(frame), 0)
     make_material_copy(obj)
     change_material(obj, "Value", "Value", 0, 1, frame + hide_duration, hide_duration)
     hide_at(obj, frame + hide_duration)
+
+"""
+Test code
+"""
+
+def benchmark_keyframes(count=10000, frame=10):
+    """compare keyframe_insert and bulk_keyframes on count fresh objects"""
+    results = {}
+    for mode in ("insert", "bulk"):
+        objs = []
+        for i in range(count):
+            obj = bpy.data.objects.new(f"Bench_{mode}_{i}", None)
+            bpy.context.scene.collection.objects.link(obj)
+            objs.append(obj)
+        start = time.perf_counter()
+        if mode == "bulk":
+            with bulk_keyframes():
+                pop_in(objs, frame=frame, delay=1)
+        else:
+            pop_in(objs, frame=frame, delay=1)
+        results[mode] = time.perf_counter() - start
+        for obj in objs:
+            action = obj.animation_data.action
+            bpy.data.objects.remove(obj)
+            bpy.data.actions.remove(action)
+    print(f"pop_in on {count} objects: keyframe_insert {results['insert']:.2f}s, "
+          f"bulk {results['bulk']:.2f}s ({results['insert'] / results['bulk']:.1f}x)")
+    return results
+
+def benchmark_choreography(count=20000, frame=10):
+    """compare per-object keys and shared NLA strips for pop_in/pop_out on count fresh objects"""
+    results = {}
+    for shared in (False, True):
+        objs = []
+        for i in range(count):
+            obj = bpy.data.objects.new(f"Bench_{'shared' if shared else 'keys'}_{i}", None)
+            bpy.context.scene.collection.objects.link(obj)
+            objs.append(obj)
+        before = set(bpy.data.actions)
+        start = time.perf_counter()
+        with batch():
+            pop_in(objs, frame=frame, delay=1, shared=shared)
+            pop_out(objs, frame=frame + count + 30, delay=1, shared=shared)
+        elapsed = time.perf_counter() - start
+        created = [action for action in bpy.data.actions if action not in before]
+        results["shared" if shared else "keys"] = {
+            "seconds": elapsed,
+            "actions": len(created),
+            "fcurves": sum(len(action.fcurves) for action in created),
+            "keyframes": sum(len(fcurve.keyframe_points) for action in created for fcurve in action.fcurves),
+        }
+        for obj in objs:
+            bpy.data.objects.remove(obj)
+        for action in created:
+            bpy.data.actions.remove(action)
+    for mode, result in results.items():
+        print(f"{mode:>6}: {result['seconds']:.2f}s, {result['actions']} actions, "
+              f"{result['fcurves']} F-curves, {result['keyframes']} keyframes")
+    return results
+
+def memory_usage():
+    """Resident memory of this process in bytes (Linux), or 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+def benchmark_instancing(template_name, counts=(1000, 10000)):
+    """compare memory and saved file size of template copy and instance modes"""
+    results = {}
+    for count in counts:
+        for mode in ("copy", "link", "collection"):
+            before = memory_usage()
+            start = time.perf_counter()
+            objs = [
+                create_object_from_template(template_name, mode=mode)
+                for _ in range(count)
+            ]
+            elapsed = time.perf_counter() - start
+            memory = memory_usage() - before
+            path = os.path.join(tempfile.gettempdir(), f"bench_{mode}_{count}.blend")
+            bpy.ops.wm.save_as_mainfile(filepath=path, copy=True)
+            size = os.path.getsize(path)
+            os.remove(path)
+            ids = set()
+            for obj in objs:
+                for o in [obj] + list(obj.children):
+                    ids.add(o)
+                    if mode == "copy" and o.data is not None:
+                        ids.add(o.data)
+            bpy.data.batch_remove(ids)
+            results[(mode, count)] = (elapsed, memory, size)
+            print(f"{mode} x{count}: {elapsed:.2f}s, "
+                  f"{memory / 2 ** 20:.1f} MiB, .blend {size / 2 ** 20:.1f} MiB")
+    return results
+
+instrument.instrument_module(globals())